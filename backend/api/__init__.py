@@ -3,7 +3,7 @@ from api.common import router as common_router
 from api.auth import router as auth_router
 from api.desk import router as desk_router
 from api.user import router as user_router
-from api.ws import router as ws_router
+from api.ws import legacy_router as ws_legacy_router, router as ws_router
 
 api_router = APIRouter()
 
@@ -11,4 +11,6 @@ api_router.include_router(common_router)
 api_router.include_router(auth_router)
 api_router.include_router(desk_router)
 api_router.include_router(user_router)
-api_router.include_router(ws_router)
\ No newline at end of file
+api_router.include_router(ws_router)
+# last: its /{desk_id} path would match any single segment
+api_router.include_router(ws_legacy_router)
\ No newline at end of file
@@ -7,17 +7,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from api.dependencies import get_session_repo, get_user_repo
 from core.database import get_db
 from core.security import (
-    verify_password,
-    get_password_hash,
     create_access_token,
     create_refresh_token,
+    password_hasher,
     verify_token,
 )
+from service.exception import PasswordHasherBusyError
 
 from repository.user import UserRepository
 from repository.session import SessionRepository
 
-from model.user import User as UserModel
 from model.session import Session as SessionModel
 
 from api.dto import (
@@ -34,25 +33,34 @@ from api.dto import (
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={"error": "SERVICE_BUSY", "message": "Сервис перегружен, повторите попытку позже"},
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register(
     request: RegisterRequest,
     user_repo: UserRepository = Depends(get_user_repo)
 ) -> None:
-    existing = await user_repo.get_by_email(request.email)
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail={"error": "USER_EXISTS", "message": "Пользователь с таким email уже существует"}
-        )
-
-    hashed_pw = get_password_hash(request.password)
-    new_user = UserModel(
+    try:
+        hashed_pw = await password_hasher.hash(request.password)
+    except PasswordHasherBusyError:
+        raise hasher_busy()
+    # uq_user_email decides, no SELECT before the INSERT
+    new_user = await user_repo.create_if_absent(
         name=request.name,
         email=request.email,
         pass_hash=hashed_pw,
     )
-    await user_repo.create(new_user)
+    if new_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": "USER_EXISTS", "message": "Пользователь с таким email уже существует"}
+        )
     # 201 Created — no content
 
 
@@ -63,7 +71,13 @@ async def login(
     session_repo: SessionRepository = Depends(get_session_repo)
 ) -> LoginResponse:
     user = await user_repo.get_by_email(request.email)
-    if not user or not verify_password(request.password, user.pass_hash):
+    try:
+        valid = user is not None and await password_hasher.verify(
+            request.password, user.pass_hash
+        )
+    except PasswordHasherBusyError:
+        raise hasher_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={"error": "INVALID_CREDENTIALS", "message": "Неверный email или пароль"}
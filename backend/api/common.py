@@ -1,4 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from api.dependencies import require_metrics_token
+
+from core.metrics import collect
 
 router = APIRouter(
     tags=["common"],
@@ -8,3 +12,8 @@ router = APIRouter(
 @router.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@router.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    return collect()
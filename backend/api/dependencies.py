@@ -1,12 +1,15 @@
+import secrets
 import uuid
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.config import settings
 from core.database import get_db
 from core.security import verify_token
-from model import User
+from core.sessions import session_state
+from core.usercache import CachedUser, get_cached_user
 from repository import (
     DeskShareRepository,
     DeskDetailRepository,
@@ -33,10 +36,26 @@ async def get_session_repo(session: AsyncSession = Depends(get_db)):
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
+
+async def require_metrics_token(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> None:
+    """Let through scrapers presenting METRICS_TOKEN; without one set there is no endpoint."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not credentials or not secrets.compare_digest(
+        credentials.credentials.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     repo: UserRepository = Depends(get_user_repo),
-) -> User:
+) -> CachedUser:
     if not credentials or not credentials.credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -57,6 +76,12 @@ async def get_current_user(
             detail="Invalid token",
         )
 
+    if not session_state.is_active(payload.get("session_id")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session is no longer active",
+        )
+
     user_id_raw = payload.get("user_id")
     if not user_id_raw:
         raise HTTPException(
@@ -72,7 +97,8 @@ async def get_current_user(
             detail="Invalid user id",
         )
 
-    user = await repo.get_by_id(user_id)
+    # the repo session only touches the DB on a cache miss
+    user = await get_cached_user(user_id, repo.get_by_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
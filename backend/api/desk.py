@@ -1,19 +1,25 @@
 from uuid import UUID
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import UUID4
 
 from api.dependencies import get_current_user, get_desk_repo, get_deskshare_repo
-from model import User as UserORM
+from core.access import grant_access, revoke_access
+from core.deskstate import desk_state
+from core.usercache import CachedUser
 from api.dto import (
     Desk, 
     DeskCreateRequest, 
+    DeskOwner,
     DesksResponseWithTotal,
     DeskUpdateRequest,
     Share, Shares,
+    SharedDesk,
+    SharedDesksWithTotal,
     UserDTO
 )
+from api.utils import decode_cursor, encode_cursor
 from repository import (
     DeskRepository,
     DeskShareRepository,
@@ -22,11 +28,72 @@ from repository import (
 
 router = APIRouter(prefix="/desks", tags=["desks"])
 
+
+def parse_cursor(cursor: str | None):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="VALIDATION_ERROR")
+
+
+@router.get("/", response_model=DesksResponseWithTotal)
+async def get_desks(
+    limit: int = Query(default=5, ge=1, le=100),
+    cursor: str | None = Query(default=None),
+    desk_repo: DeskRepository = Depends(get_desk_repo),
+    current_user: CachedUser = Depends(get_current_user),
+):
+    # one extra row tells whether there is a next page
+    desks, total = await desk_repo.get_owned_page(
+        current_user.id, limit + 1, parse_cursor(cursor)
+    )
+    page = desks[:limit]
+    return DesksResponseWithTotal(
+        desks=page,
+        total=total,
+        next_cursor=(
+            encode_cursor(page[-1].updated_at, page[-1].id) if len(desks) > limit else None
+        ),
+    )
+
+
+@router.get("/shared", response_model=SharedDesksWithTotal)
+async def get_shared_desks(
+    limit: int = Query(default=5, ge=1, le=100),
+    cursor: str | None = Query(default=None),
+    deskshare_repo: DeskShareRepository = Depends(get_deskshare_repo),
+    current_user: CachedUser = Depends(get_current_user),
+):
+    rows, total = await deskshare_repo.get_shared_page(
+        current_user.id, limit + 1, parse_cursor(cursor)
+    )
+    page = rows[:limit]
+    return SharedDesksWithTotal(
+        desks=[
+            SharedDesk(
+                id=row.id,
+                name=row.name,
+                owner=DeskOwner(id=row.owner_id, name=row.owner_name),
+                shared_at=row.shared_at,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in page
+        ],
+        total=total,
+        next_cursor=(
+            encode_cursor(page[-1].shared_at, page[-1].id) if len(rows) > limit else None
+        ),
+    )
+
+
 @router.post("/", response_model=Desk)
 async def create_desk(
     request: DeskCreateRequest,
     desk_repo: DeskRepository = Depends(get_desk_repo),
-    current_user: UserORM = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
 ):
     desk = await desk_repo.create(
         name=request.name,
@@ -39,7 +106,7 @@ async def create_desk(
 async def delete_desk(
     desk_id: UUID4,
     desk_repo: DeskRepository = Depends(get_desk_repo),
-    current_user: UserORM = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
 ):
     desk = await desk_repo.get_by_id(
         desk_id=desk_id,
@@ -58,6 +125,9 @@ async def delete_desk(
     if not result:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND)
 
+    await revoke_access(desk_id, reason="Desk deleted")
+    desk_state.forget(desk_id)
+
     return Response(status_code=HTTPStatus.NO_CONTENT)
 
 
@@ -66,7 +136,7 @@ async def update_desk(
     desk_id: UUID4,
     request: DeskUpdateRequest,
     desk_repo: DeskRepository = Depends(get_desk_repo),
-    current_user: UserORM = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
 ):
     desk = await desk_repo.get_by_id(desk_id=desk_id)
 
@@ -91,7 +161,7 @@ async def update_desk(
 @router.get("/{desk_id}/shares", response_model=Shares)
 async def get_desk_shares(
     desk_id: UUID,
-    current_user: UserORM= Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     desk_repo: DeskRepository = Depends(get_desk_repo),
     deskshare_repo: DeskShareRepository = Depends(get_deskshare_repo),
 ):
@@ -121,7 +191,7 @@ async def get_desk_shares(
 async def share_desk_with_user(
     desk_id: UUID,
     user_id: UUID,
-    current_user: UserORM = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     desk_repo: DeskRepository = Depends(get_desk_repo),
     deskshare_repo: DeskShareRepository = Depends(get_deskshare_repo)
 ):
@@ -130,6 +200,8 @@ async def share_desk_with_user(
         raise HTTPException(status_code=403, detail="FORBIDDEN")
 
     row = await deskshare_repo.add_user_to_desk_share(desk_id, user_id)
+    # a cached "no access" would keep rejecting the new member
+    await grant_access(desk_id, user_id)
 
     return Share(
         id=row.id,
@@ -146,11 +218,11 @@ async def share_desk_with_user(
 async def revoke_desk_access(
     desk_id: UUID,
     user_id: UUID,
-    current_user: UserORM = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     desk_repo: DeskRepository = Depends(get_desk_repo),
     deskshare_repo: DeskShareRepository = Depends(get_deskshare_repo)
 ):
-    is_owned = desk_repo.is_owned_by_user(desk_id, current_user.id)
+    is_owned = await desk_repo.is_owned_by_user(desk_id, current_user.id)
     if not is_owned:
         raise HTTPException(status_code=403, detail="FORBIDDEN")
     
@@ -158,6 +230,7 @@ async def revoke_desk_access(
         raise HTTPException(status_code=400, detail="CANNOT_REVOKE_OWNER")
     
     await deskshare_repo.delete_user_from_desk_share(desk_id, user_id)
+    await revoke_access(desk_id, user_id)
 
 
 
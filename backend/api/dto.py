@@ -79,6 +79,8 @@ class Desk(BaseModel):
 class DesksResponseWithTotal(BaseModel):
     desks: list[Desk]
     total: int
+    # pass as ?cursor= for the next page, None on the last one
+    next_cursor: str | None = None
 
 
 class DeskOwner(BaseModel):
@@ -97,8 +99,9 @@ class SharedDesk(BaseModel):
 
 
 class SharedDesksWithTotal(BaseModel):
-    shares: list[SharedDesk]
+    desks: list[SharedDesk]
     total: int
+    next_cursor: str | None = None
 
 
 class Share(BaseModel):
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Query, Depends
 
 from api.dependencies import get_current_user
 from api.dto import UserDTO, Users
+from core.usercache import CachedUser, search_cached_users
 from model import User
 from api.dto import UserDTO, Users
 from api.dependencies import get_user_repo, get_current_user
@@ -11,7 +12,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/me", response_model=UserDTO)
 async def get_me(
-    current_user: User = Depends(get_current_user)
+    current_user: CachedUser = Depends(get_current_user)
 ):
     return current_user
 
@@ -25,7 +26,7 @@ async def search_users(
     if not q or len(q.strip()) == 0:
         users = await user_repo.get_all(limit=limit)
     else:
-        users = await user_repo.search_by_email(q.strip(), limit=limit)
+        users = await search_cached_users(q, limit, user_repo.search)
 
     return Users(
         users=[
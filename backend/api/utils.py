@@ -1,13 +1,117 @@
-import json
+import base64
+import math
+import uuid
+from datetime import date
 
+from core.config import settings
 from model import DeskDetail
 
+STICKER_FIELDS = ("coord", "size", "color", "text")
+# wire objects stored as one numeric column per key
+GEOMETRY_FIELDS = {"coord": ("x", "y"), "size": ("width", "height")}
+
+
+def encode_cursor(updated_at: date, id: uuid.UUID) -> str:
+    """Opaque keyset cursor for list endpoints ordered by (updated_at, id)."""
+    raw = f"{updated_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[date, uuid.UUID]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, id = raw.split("|")
+        return date.fromisoformat(updated_at), uuid.UUID(id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _number(value) -> int | float:
+    """Geometry value as sent on the wire: whole numbers stay ints."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("coordinates must be numbers")
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError("coordinates must be finite")
+    return int(value) if value.is_integer() else value
+
+
+def sticker_fields(data: dict) -> dict:
+    """Pick sticker fields out of event data; raises ValueError on bad geometry."""
+    fields = {key: data[key] for key in STICKER_FIELDS if key in data}
+    for key, names in GEOMETRY_FIELDS.items():
+        if key in fields:
+            value = fields[key]
+            if not isinstance(value, dict):
+                raise ValueError(f"{key} must be an object")
+            fields[key] = {name: _number(value.get(name)) for name in names}
+    return fields
+
+
 def sticker_to_dict(sticker: DeskDetail) -> dict:
     """Convert DeskDetail model to dict for JSON response."""
     return {
         "id": str(sticker.id),
-        "coord": json.loads(sticker.coord) if isinstance(sticker.coord, str) else sticker.coord,
-        "size": json.loads(sticker.size) if isinstance(sticker.size, str) else sticker.size,
+        "coord": {"x": _number(sticker.x), "y": _number(sticker.y)},
+        "size": {"width": _number(sticker.width), "height": _number(sticker.height)},
         "color": sticker.color,
         "text": sticker.text,
-    }
\ No newline at end of file
+        "version": sticker.version,
+    }
+
+
+def light_sticker(sticker: dict) -> dict:
+    """Sticker for a light desk:init: a long text is replaced by its `preview`.
+
+    Short texts are kept as they are. A sticker without `text` has to be
+    fetched with sticker:fetch before the client can edit its text.
+    """
+    text = sticker.get("text") or ""
+    if len(text) <= settings.STICKER_TEXT_PREVIEW_CHARS:
+        return sticker
+    light = {key: value for key, value in sticker.items() if key != "text"}
+    light["preview"] = text[:settings.STICKER_TEXT_PREVIEW_CHARS]
+    return light
+
+
+def new_sticker_data(data: dict) -> dict:
+    """Build sticker dict with a new id from sticker:create data, applying defaults.
+
+    Raises ValueError on bad geometry.
+    """
+    return {
+        "id": str(uuid.uuid4()),
+        "coord": {"x": 0, "y": 0},
+        "size": {"width": 150, "height": 100},
+        "color": "#FFEB3B",
+        "text": "",
+        **sticker_fields(data),
+        "version": 1,
+    }
+
+
+def sticker_fields_to_columns(fields: dict) -> dict:
+    """Convert changed sticker fields to desk_detail column values."""
+    columns = {}
+    for key, value in fields.items():
+        if key in GEOMETRY_FIELDS:
+            columns.update((name, value[name]) for name in GEOMETRY_FIELDS[key])
+        else:
+            columns[key] = value
+    return columns
+
+
+def sticker_data_to_row(desk_id: uuid.UUID, sticker: dict) -> dict:
+    """Convert sticker dict back to desk_detail column values."""
+    today = date.today()
+    return {
+        "id": uuid.UUID(sticker["id"]),
+        "desk_id": desk_id,
+        **sticker_fields_to_columns(
+            {key: sticker[key] for key in STICKER_FIELDS}
+        ),
+        "version": sticker.get("version", 1),
+        "created_at": today,
+        "updated_at": today,
+    }
@@ -1,146 +1,637 @@
 import uuid
-import json
-from datetime import date
 
-from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, Depends
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
 
-from core.connmanager import manager
+from core.access import has_desk_access
+from core.coalescer import PendingUpdate, coalescer
+from core.connmanager import ClientConnection, DeskConnection, manager
+from core.database import async_session_factory
+from core.encoding import MSGPACK_SUBPROTOCOL, msgpack, unpack
+from core.deskstate import desk_state
+from core.config import settings
 from core.security import verify_token
-from api.dependencies import get_deskdetail_repo, get_deskshare_repo
+from core.sessions import session_state
+from core.spatial import Rect
+from core.textops import apply_ops, dump_ops, parse_ops, text_history, transform
 from repository.desk_detail import DeskDetailRepository
-from repository.desk_share import DeskShareRepository
-from model import DeskDetail
-from api.utils import sticker_to_dict
+from api.utils import (
+    STICKER_FIELDS,
+    light_sticker,
+    new_sticker_data,
+    sticker_data_to_row,
+    sticker_fields,
+    sticker_fields_to_columns,
+    sticker_to_dict,
+)
+from service.exception import StickerVersionConflictError, StickersNotFoundError
 
-router = APIRouter(tags=["websocket"])
+# its own namespace, so desk ids never meet other paths
+router = APIRouter(prefix="/ws", tags=["websocket"])
+# the desk route at its original path, for clients that still connect there
+legacy_router = APIRouter(tags=["websocket"])
 
 
-@router.websocket("/{desk_id}")
+@router.websocket("")
+async def client_ws(
+        ws: WebSocket,
+        token: str = Query(...),
+):
+    """One socket for any number of desks, added with desk:subscribe.
+
+    The token and session are checked once for the socket, access once per
+    subscribed desk. Desk frames in both directions carry the desk_id.
+    """
+    binary = msgpack is not None and MSGPACK_SUBPROTOCOL in ws.scope.get("subprotocols", [])
+    await ws.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
+
+    user_id = await authenticate(ws, token)
+    if user_id is None:
+        return
+
+    client = manager.open(ws, binary, str(user_id), multiplexed=True)
+    # desks whose in-memory state this socket keeps loaded; a revoked one
+    # stays loaded until it is unsubscribed or the socket closes
+    pinned: set[uuid.UUID] = set()
+    try:
+        await receive_client_events(ws, client, user_id, pinned)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await client.close()
+        for desk_uuid in pinned:
+            await release_desk(str(desk_uuid), desk_uuid)
+
+
+@router.websocket("/desks/{desk_id}")
 async def desk_ws(
         ws: WebSocket,
         desk_id: str,
         token: str = Query(...),
-        share_repo: DeskShareRepository = Depends(get_deskshare_repo),
-        detail_repo: DeskDetailRepository = Depends(get_deskdetail_repo)
+        since: int | None = Query(default=None),
+        epoch: str | None = Query(default=None),
+        viewport: str | None = Query(default=None),
+        init: str | None = Query(default=None),
 ):
+    # No Depends(get_db) here: a request-scoped session would hold a pooled
+    # connection for the whole life of the socket. Each DB access below
+    # borrows a session of its own and returns it right away.
     # Сначала принимаем WebSocket, чтобы можно было отправить close code
-    await ws.accept()
+    binary = msgpack is not None and MSGPACK_SUBPROTOCOL in ws.scope.get("subprotocols", [])
+    await ws.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
 
-    payload = verify_token(token, "access")
-    if not payload:
-        await ws.close(code=4001, reason="Invalid token")
-        return
-
-    user_id_str = payload.get("user_id")
-    if not user_id_str:
-        await ws.close(code=4001, reason="Invalid token payload")
+    user_id = await authenticate(ws, token)
+    if user_id is None:
         return
 
     try:
-        user_id = uuid.UUID(user_id_str)
         desk_uuid = uuid.UUID(desk_id)
     except ValueError:
         await ws.close(code=4000, reason="Invalid UUID format")
         return
+    # the same desk is one key however the path spells it: revokes,
+    # broadcasts and the multiplexed route all use the canonical form
+    desk_id = str(desk_uuid)
+
+    try:
+        viewport_rect = parse_viewport(viewport.split(",")) if viewport else None
+    except ValueError:
+        await ws.close(code=4000, reason="Invalid viewport")
+        return
 
-    has_access = await share_repo.has_access(user_id, desk_uuid)
+    has_access = await has_desk_access(user_id, desk_uuid)
 
     if not has_access:
         await ws.close(code=4003, reason="Access denied")
         return
 
-    # Регистрируем соединение (без повторного accept)
-    manager.add_connection(desk_id, ws)
+    if desk_state.enabled:
+        await desk_state.acquire(desk_uuid)
 
     try:
-        stickers = await detail_repo.get_by_desk_id(desk_uuid)
-        stickers_data = [sticker_to_dict(s) for s in stickers]
+        # Регистрируем соединение (без повторного accept)
+        conn = await manager.add_connection(desk_id, ws, binary, str(user_id))
+
+        try:
+            await init_desk(conn, desk_id, desk_uuid, since, epoch, viewport_rect, init)
+            await receive_events(ws, conn, desk_id, desk_uuid)
+
+        except WebSocketDisconnect:
+            pass
+
+        finally:
+            # also stops its writer task on errors and cancellation
+            await manager.disconnect(desk_id, conn)
+
+    finally:
+        if desk_state.enabled:
+            await release_desk(desk_id, desk_uuid)
 
-        await ws.send_json({
+
+legacy_router.add_api_websocket_route("/{desk_id}", desk_ws)
+
+
+async def release_desk(desk_id: str, desk_uuid: uuid.UUID) -> None:
+    """Unpin the desk state once updates still waiting for their tick are applied."""
+    # the last release unloads the desk, a later tick would find it gone
+    await coalescer.flush(desk_id)
+    await desk_state.release(desk_uuid)
+
+
+async def authenticate(ws: WebSocket, token: str) -> uuid.UUID | None:
+    """User of an access token, or None once the socket is closed with 4001/4000."""
+    payload = verify_token(token, "access")
+    if not payload:
+        await ws.close(code=4001, reason="Invalid token")
+        return None
+
+    if not session_state.is_active(payload.get("session_id")):
+        await ws.close(code=4001, reason="Session is no longer active")
+        return None
+
+    user_id_str = payload.get("user_id")
+    if not user_id_str:
+        await ws.close(code=4001, reason="Invalid token payload")
+        return None
+
+    try:
+        return uuid.UUID(user_id_str)
+    except ValueError:
+        await ws.close(code=4000, reason="Invalid UUID format")
+        return None
+
+
+async def init_desk(
+        conn: DeskConnection,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        since: int | None,
+        epoch: str | None,
+        viewport_rect: Rect | None,
+        init: str | None,
+) -> None:
+    """Send a new subscriber the state of the desk: a viewport, missed ops or a snapshot.
+
+    Must be awaited right after the subscription, before any other await,
+    so resume() sees no frame the replay doesn't cover.
+    """
+    # comma separated: "stream" sends the desk in chunks, "light" without long texts
+    init_modes = set(init.split(",")) if init else set()
+    light = "light" in init_modes
+
+    if viewport_rect is not None:
+        # scoped client: only the stickers inside the viewport, no resume
+        # broadcasts from now on go out after the init they apply to
+        conn.hold()
+        conn.viewport = viewport_rect
+        view = await manager.view(desk_id, lambda: load_stickers(desk_uuid))
+        log_epoch, version = manager.version(desk_id)
+        conn.visible = view.query(viewport_rect)
+        await conn.push({
             "event": "desk:init",
-            "data": {"stickers": stickers_data},
+            "data": {
+                "stickers": [
+                    light_sticker(view.stickers[i]) if light else view.stickers[i]
+                    for i in conn.visible
+                ],
+                "epoch": log_epoch,
+                "version": version,
+            },
         })
+        await conn.release()
+    # reconnect: replay only the missed ops if they are still in the log
+    elif since is None or not manager.resume(conn, since, epoch):
+        # broadcasts from now on go out after the snapshot they apply to
+        conn.hold()
+        if "stream" in init_modes:
+            await stream_init(conn, desk_id, desk_uuid, light)
+        else:
+            # a reconnect storm on one desk costs one load and one encoding
+            await conn.push(await manager.snapshot(
+                desk_id,
+                lambda: load_stickers(desk_uuid, light),
+                variant="light" if light else None,
+            ))
+        await conn.release()
 
-        while True:
-            msg = await ws.receive_json()
-            event = msg.get("event")
-            data = msg.get("data") or {}
 
-            if event == "sticker:create":
-                await handle_sticker_create(
-                    ws, desk_id, desk_uuid, data, detail_repo
-                )
-                continue
-            if event == "sticker:update":
-                await handle_sticker_update(
-                    ws, desk_id, desk_uuid, data, detail_repo
-                )
-                continue
+def parse_viewport(values: list) -> Rect:
+    """x, y, width, height -> rect; raises ValueError."""
+    if not isinstance(values, (list, tuple)) or len(values) != 4:
+        raise ValueError("viewport needs x, y, width and height")
+    x, y, width, height = (float(v) for v in values)
+    if width < 0 or height < 0:
+        raise ValueError("viewport size can't be negative")
+    return x, y, x + width, y + height
+
+
+async def load_stickers(desk_uuid: uuid.UUID, light: bool = False) -> list[dict]:
+    if desk_state.enabled:
+        state = desk_state.get(desk_uuid)
+        if state is not None:
+            stickers = list(state.stickers.values())
+            return [light_sticker(s) for s in stickers] if light else stickers
+    async with async_session_factory() as session:
+        stickers = await DeskDetailRepository(session).get_by_desk_id(desk_uuid)
+    if light:
+        return [light_sticker(sticker_to_dict(s)) for s in stickers]
+    return [sticker_to_dict(s) for s in stickers]
+
+
+async def stream_init(
+        conn: DeskConnection,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        light: bool = False,
+) -> None:
+    """Send the desk as desk:init:chunk frames followed by desk:init:done.
+
+    Stickers are read one keyset page per chunk, and each chunk waits for
+    room in the send queue, so neither the whole desk nor all of its frames
+    are held in memory at once. The session is returned before the wait, a
+    slow client never holds a pooled connection; changes made between pages
+    reach it as the broadcasts held back until the stream is done.
+    """
+    log_epoch, version = manager.version(desk_id)
+    size = settings.DESK_INIT_CHUNK_SIZE
+    count = 0
 
-            if event == "sticker:delete":
-                await handle_sticker_delete(
-                    ws, desk_id, desk_uuid, data, detail_repo
+    state = desk_state.get(desk_uuid) if desk_state.enabled else None
+    if state is not None:
+        stickers = list(state.stickers.values())
+        for i in range(0, len(stickers), size):
+            if conn.closed:
+                return
+            chunk = stickers[i:i + size]
+            if light:
+                chunk = [light_sticker(s) for s in chunk]
+            await conn.push({"event": "desk:init:chunk", "data": {"stickers": chunk}})
+            count += len(chunk)
+    else:
+        after = None
+        while not conn.closed:
+            async with async_session_factory() as session:
+                rows = await DeskDetailRepository(session).get_page_by_desk_id(
+                    desk_uuid, size, after
                 )
-                continue
+            if not rows:
+                break
+            after = rows[-1].id
+            await conn.push({
+                "event": "desk:init:chunk",
+                "data": {"stickers": [
+                    light_sticker(sticker_to_dict(row)) if light else sticker_to_dict(row)
+                    for row in rows
+                ]},
+            })
+            count += len(rows)
+            if len(rows) < size:
+                break
+        if conn.closed:
+            return
+
+    await conn.push({
+        "event": "desk:init:done",
+        "data": {"epoch": log_epoch, "version": version, "count": count},
+    })
 
-            await ws.send_json({
+
+async def receive(ws: WebSocket, binary: bool) -> dict:
+    if binary:
+        return unpack(await ws.receive_bytes())
+    return await ws.receive_json()
+
+
+async def receive_events(
+        ws: WebSocket,
+        conn: DeskConnection,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+):
+    while True:
+        await handle_desk_event(conn, desk_id, desk_uuid, await receive(ws, conn.binary))
+
+
+async def receive_client_events(
+        ws: WebSocket,
+        client: ClientConnection,
+        user_id: uuid.UUID,
+        pinned: set[uuid.UUID],
+):
+    while True:
+        msg = await receive(ws, client.binary)
+        event = msg.get("event")
+
+        if event == "desk:subscribe":
+            await handle_desk_subscribe(client, user_id, msg, pinned)
+            continue
+
+        if event == "desk:unsubscribe":
+            await handle_desk_unsubscribe(client, msg, pinned)
+            continue
+
+        conn = client.desks.get(parse_desk_id(msg.get("desk_id")))
+        if conn is None:
+            client.send({
                 "event": "error",
-                "data": {"code": "UNKNOWN_EVENT", "message": "Unknown event"},
+                "desk_id": msg.get("desk_id"),
+                "data": {"code": "NOT_SUBSCRIBED", "message": "Not subscribed to the desk"},
             })
+            continue
+        await handle_desk_event(conn, conn.desk_id, uuid.UUID(conn.desk_id), msg)
+
+
+def parse_desk_id(value) -> str | None:
+    """Canonical form of a desk UUID, or None if it isn't one."""
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+async def handle_desk_subscribe(
+        client: ClientConnection,
+        user_id: uuid.UUID,
+        msg: dict,
+        pinned: set[uuid.UUID],
+):
+    """Add a desk to a multiplexed socket and send its state, as the desk route does on connect."""
+    desk_id = parse_desk_id(msg.get("desk_id"))
+    data = msg.get("data") or {}
+
+    if desk_id is None:
+        client.send({
+            "event": "error",
+            "desk_id": msg.get("desk_id"),
+            "data": {"code": "VALIDATION_ERROR", "message": "Invalid desk_id format"},
+        })
+        return
+    if desk_id in client.desks:
+        client.send({
+            "event": "error",
+            "desk_id": msg.get("desk_id"),
+            "data": {"code": "VALIDATION_ERROR", "message": "Already subscribed to the desk"},
+        })
+        return
+    if len(client.desks) >= settings.WS_MAX_SUBSCRIPTIONS:
+        client.send({
+            "event": "error",
+            "desk_id": msg.get("desk_id"),
+            "data": {
+                "code": "VALIDATION_ERROR",
+                "message": f"A socket is limited to {settings.WS_MAX_SUBSCRIPTIONS} desks",
+            },
+        })
+        return
+
+    viewport = data.get("viewport")
+    try:
+        viewport_rect = parse_viewport(
+            [viewport.get(key) for key in ("x", "y", "width", "height")]
+        ) if viewport else None
+    except (AttributeError, TypeError, ValueError):
+        client.send({
+            "event": "error",
+            "desk_id": msg.get("desk_id"),
+            "data": {
+                "code": "VALIDATION_ERROR",
+                "message": "viewport needs numeric x, y, width and height",
+            },
+        })
+        return
+
+    since = data.get("since")
+    if since is not None and (not isinstance(since, int) or isinstance(since, bool)):
+        client.send({
+            "event": "error",
+            "desk_id": msg.get("desk_id"),
+            "data": {"code": "VALIDATION_ERROR", "message": "since must be an integer"},
+        })
+        return
+    epoch = data.get("epoch")
+    init = data.get("init")
+
+    desk_uuid = uuid.UUID(desk_id)
+    if not await has_desk_access(user_id, desk_uuid):
+        client.send({
+            "event": "error",
+            "desk_id": msg.get("desk_id"),
+            "data": {"code": "FORBIDDEN", "message": "Access denied"},
+        })
+        return
+
+    if desk_state.enabled and desk_uuid not in pinned:
+        await desk_state.acquire(desk_uuid)
+        pinned.add(desk_uuid)
+
+    conn = await manager.subscribe(client, desk_id)
+    await init_desk(
+        conn,
+        desk_id,
+        desk_uuid,
+        since,
+        epoch if isinstance(epoch, str) else None,
+        viewport_rect,
+        init if isinstance(init, str) else None,
+    )
+
+
+async def handle_desk_unsubscribe(
+        client: ClientConnection,
+        msg: dict,
+        pinned: set[uuid.UUID],
+):
+    """Drop a desk from a multiplexed socket, other desks go on."""
+    desk_id = parse_desk_id(msg.get("desk_id"))
+    conn = client.desks.get(desk_id) if desk_id is not None else None
+    if conn is None:
+        client.send({
+            "event": "error",
+            "desk_id": msg.get("desk_id"),
+            "data": {"code": "NOT_SUBSCRIBED", "message": "Not subscribed to the desk"},
+        })
+        return
+
+    await manager.unsubscribe(conn)
+    desk_uuid = uuid.UUID(desk_id)
+    if desk_uuid in pinned:
+        pinned.discard(desk_uuid)
+        await release_desk(desk_id, desk_uuid)
+    client.send({"event": "desk:unsubscribed", "desk_id": desk_id, "data": {}})
+
+
+async def handle_desk_event(
+        conn: DeskConnection,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        msg: dict,
+):
+    """Dispatch a client event of one desk to its handler."""
+    event = msg.get("event")
+    data = msg.get("data") or {}
+
+    if event == "sticker:create":
+        await handle_sticker_create(conn, desk_id, desk_uuid, data)
+        return
+    if event == "sticker:update":
+        await handle_sticker_update(
+            conn, desk_id, desk_uuid, data
+        )
+        return
+
+    if event == "sticker:delete":
+        await handle_sticker_delete(conn, desk_id, desk_uuid, data)
+        return
+
+    if event == "batch":
+        await handle_batch(conn, desk_id, desk_uuid, data)
+        return
+
+    if event == "sticker:fetch":
+        await handle_sticker_fetch(conn, desk_uuid, data)
+        return
+
+    if event == "viewport:set":
+        await handle_viewport_set(conn, desk_id, desk_uuid, msg.get("data"))
+        return
+
+    conn.send({
+        "event": "error",
+        "data": {"code": "UNKNOWN_EVENT", "message": "Unknown event"},
+    })
 
-    except WebSocketDisconnect:
-        manager.disconnect(desk_id, ws)
 
-    except Exception as e:
-        manager.disconnect(desk_id, ws)
-        raise
+async def handle_viewport_set(
+        conn: DeskConnection,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        data: dict | None,
+):
+    """Scope the connection to a rectangle of the desk, null clears it."""
+    if data:
+        try:
+            rect = parse_viewport(
+                [data.get(key) for key in ("x", "y", "width", "height")]
+            )
+        except (TypeError, ValueError):
+            conn.send({
+                "event": "error",
+                "data": {
+                    "code": "VALIDATION_ERROR",
+                    "message": "viewport needs numeric x, y, width and height",
+                },
+            })
+            return
+    else:
+        rect = None
+
+    view = await manager.view(desk_id, lambda: load_stickers(desk_uuid))
+    manager.set_viewport(conn, view, rect)
+
+
+async def handle_sticker_fetch(
+        conn: DeskConnection,
+        desk_uuid: uuid.UUID,
+        data: dict,
+):
+    """Full texts of stickers the client got as previews, sent to the asker only."""
+    ids = data.get("sticker_ids")
+    if not isinstance(ids, list) or not ids:
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": "sticker_ids required"},
+        })
+        return
+
+    if len(ids) > settings.STICKER_FETCH_MAX_IDS:
+        conn.send({
+            "event": "error",
+            "data": {
+                "code": "VALIDATION_ERROR",
+                "message": f"Fetch is limited to {settings.STICKER_FETCH_MAX_IDS} stickers",
+            },
+        })
+        return
+
+    try:
+        sticker_ids = list(dict.fromkeys(str(uuid.UUID(i)) for i in ids))
+    except (TypeError, ValueError, AttributeError):
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": "Invalid sticker_id format"},
+        })
+        return
+
+    texts: list[dict] = []
+    state = desk_state.get(desk_uuid) if desk_state.enabled else None
+    if state is not None:
+        for sticker_id in sticker_ids:
+            sticker = state.stickers.get(sticker_id)
+            if sticker is not None:
+                texts.append({
+                    "id": sticker_id,
+                    "text": sticker["text"],
+                    "version": sticker["version"],
+                })
+    else:
+        async with async_session_factory() as session:
+            rows = await DeskDetailRepository(session).get_texts(
+                desk_uuid, [uuid.UUID(i) for i in sticker_ids]
+            )
+        texts = [{"id": str(r.id), "text": r.text, "version": r.version} for r in rows]
+
+    found = {t["id"] for t in texts}
+    conn.send({
+        "event": "sticker:fetched",
+        "data": {
+            "stickers": texts,
+            "missing": [i for i in sticker_ids if i not in found],
+        },
+    })
 
 
 async def handle_sticker_create(
-        ws: WebSocket,
+        conn: DeskConnection,
         desk_id: str,
         desk_uuid: uuid.UUID,
         data: dict,
-        repo: DeskDetailRepository,
 ):
     temp_id = data.get("temp_id")
-    coord = data.get("coord", {"x": 0, "y": 0})
-    size = data.get("size", {"width": 150, "height": 100})
-    color = data.get("color", "#FFEB3B")
-    text = data.get("text", "")
-
-    sticker = DeskDetail(
-        id=uuid.uuid4(),
-        desk_id=desk_uuid,
-        coord=json.dumps(coord),
-        size=json.dumps(size),
-        color=color,
-        text=text,
-        created_at=date.today(),
-        updated_at=date.today(),
-    )
+    try:
+        sticker_data = new_sticker_data(data)
+    except ValueError as e:
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": str(e)},
+        })
+        return
 
-    sticker = await repo.create(sticker)
+    if desk_state.enabled:
+        desk_state.create(desk_uuid, sticker_data)
+    else:
+        async with async_session_factory() as session:
+            sticker = await DeskDetailRepository(session).create(
+                sticker_data_to_row(desk_uuid, sticker_data)
+            )
+        sticker_data = sticker_to_dict(sticker)
 
     await manager.broadcast_to_desk(desk_id, {
         "event": "sticker:created",
         "data": {
             "temp_id": temp_id,
-            "sticker": sticker_to_dict(sticker),
+            "sticker": sticker_data,
         },
-    })
+    }, origin=conn)
 
 
 async def handle_sticker_update(
-        ws: WebSocket,
+        conn: DeskConnection,
         desk_id: str,
         desk_uuid: uuid.UUID,
         data: dict,
-        repo: DeskDetailRepository,
 ):
     sticker_id_str = data.get("sticker_id")
     if not sticker_id_str:
-        await ws.send_json({
+        conn.send({
             "event": "error",
             "data": {"code": "VALIDATION_ERROR", "message": "sticker_id required"},
         })
@@ -149,55 +640,266 @@ async def handle_sticker_update(
     try:
         sticker_id = uuid.UUID(sticker_id_str)
     except ValueError:
-        await ws.send_json({
+        conn.send({
             "event": "error",
             "data": {"code": "VALIDATION_ERROR", "message": "Invalid sticker_id format"},
         })
         return
 
-    sticker = await repo.get_by_id(sticker_id)
-    if not sticker or sticker.desk_id != desk_uuid:
-        await ws.send_json({
+    # optional: version the edit is based on, stale edits get CONFLICT
+    version = data.get("version")
+    if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+        conn.send({
             "event": "error",
-            "data": {"code": "NOT_FOUND", "message": "Sticker not found"},
+            "data": {"code": "VALIDATION_ERROR", "message": "version must be an integer"},
         })
         return
 
-    # Update fields if provided
-    if "coord" in data:
-        sticker.coord = json.dumps(data["coord"])
-    if "size" in data:
-        sticker.size = json.dumps(data["size"])
-    if "color" in data:
-        sticker.color = data["color"]
-    if "text" in data:
-        sticker.text = data["text"]
+    if "text_ops" in data:
+        await handle_text_ops(conn, desk_id, desk_uuid, str(sticker_id), data, version)
+        return
 
-    sticker.updated_at = date.today()
-    await repo.update(sticker)
+    try:
+        fields = sticker_fields(data)
+    except ValueError as e:
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": str(e)},
+        })
+        return
 
-    await manager.broadcast_to_desk(desk_id, {
-        "event": "sticker:updated",
-        "data": {
-            "sticker_id": str(sticker_id),
-            "coord": json.loads(sticker.coord),
-            "size": json.loads(sticker.size),
-            "color": sticker.color,
-            "text": sticker.text,
-        },
-    })
+    if coalescer.enabled:
+        coalescer.submit(desk_id, desk_uuid, str(sticker_id), fields, conn, version)
+        return
+
+    pending = PendingUpdate()
+    pending.fields.update(fields)
+    pending.conns.add(conn)
+    pending.version = version
+    async with coalescer.exclusive(desk_id):
+        await apply_sticker_updates(desk_id, desk_uuid, {str(sticker_id): pending})
+
+
+async def handle_text_ops(
+        conn: DeskConnection,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        sticker_id: str,
+        data: dict,
+        version: int | None,
+):
+    """Edit the text by insert/delete ops made on sticker `version`.
+
+    Ops made on an older version are transformed against the text changes
+    since, so concurrent typists are merged instead of overwriting each
+    other. The broadcast carries the transformed ops, not the whole text.
+    """
+    if version is None:
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": "text_ops need a version"},
+        })
+        return
+
+    if any(key in data for key in STICKER_FIELDS):
+        conn.send({
+            "event": "error",
+            "data": {
+                "code": "VALIDATION_ERROR",
+                "message": "text_ops can't be combined with other fields",
+            },
+        })
+        return
+
+    try:
+        ops = parse_ops(data["text_ops"])
+    except ValueError as e:
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": str(e)},
+        })
+        return
+
+    async with coalescer.exclusive(desk_id):
+        # earlier updates of the desk still waiting for their tick go first
+        await coalescer.flush_locked(desk_id)
+
+        sticker = await load_sticker(desk_uuid, sticker_id)
+        if sticker is None:
+            conn.send({
+                "event": "error",
+                "data": {"code": "NOT_FOUND", "message": "Sticker not found"},
+            })
+            return
+
+        missed = None
+        if version <= sticker["version"]:
+            missed = text_history.since(sticker_id, version, sticker["version"])
+        if missed is None:
+            # the text was replaced meanwhile or its history is gone
+            conn.send({
+                "event": "error",
+                "data": {
+                    "code": "CONFLICT",
+                    "message": "Sticker was changed by someone else",
+                    "sticker": sticker,
+                },
+            })
+            return
+
+        ops = transform(ops, missed)
+        try:
+            text = apply_ops(sticker["text"] or "", ops)
+        except ValueError as e:
+            conn.send({
+                "event": "error",
+                "data": {"code": "VALIDATION_ERROR", "message": str(e)},
+            })
+            return
+
+        if desk_state.enabled:
+            sticker = desk_state.update(desk_uuid, sticker_id, {"text": text}, sticker["version"])
+        else:
+            async with async_session_factory() as session:
+                rows = await DeskDetailRepository(session).update_many(
+                    desk_uuid,
+                    {uuid.UUID(sticker_id): {"text": text}},
+                    {uuid.UUID(sticker_id): sticker["version"]},
+                )
+            if not rows:
+                # changed by another worker between the read and the write
+                conn.send({
+                    "event": "error",
+                    "data": {
+                        "code": "CONFLICT",
+                        "message": "Sticker was changed by someone else",
+                        "sticker": await load_sticker(desk_uuid, sticker_id),
+                    },
+                })
+                return
+            sticker = sticker_to_dict(rows[0])
+
+        text_history.record(sticker_id, sticker["version"], ops)
+        await manager.broadcast_to_desk(desk_id, {
+            "event": "sticker:updated",
+            "data": {
+                "sticker_id": sticker_id,
+                "text_ops": dump_ops(ops),
+                "version": sticker["version"],
+            },
+        })
+
+
+async def load_sticker(desk_uuid: uuid.UUID, sticker_id: str) -> dict | None:
+    if desk_state.enabled:
+        state = desk_state.get(desk_uuid)
+        if state is not None:
+            sticker = state.stickers.get(sticker_id)
+            return dict(sticker) if sticker is not None else None
+    async with async_session_factory() as session:
+        rows = await DeskDetailRepository(session).get_by_ids(desk_uuid, [uuid.UUID(sticker_id)])
+    return sticker_to_dict(rows[0]) if rows else None
+
+
+async def apply_sticker_updates(
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        updates: dict[str, PendingUpdate],
+):
+    """Persist merged sticker updates and broadcast one frame per sticker."""
+    updated: dict[str, dict] = {}
+    # stale edits: sticker id -> its current state
+    conflicts: dict[str, dict] = {}
+
+    if desk_state.enabled:
+        for sticker_id, pending in updates.items():
+            try:
+                sticker_data = desk_state.update(
+                    desk_uuid, sticker_id, pending.fields, pending.version
+                )
+            except StickerVersionConflictError as e:
+                conflicts[sticker_id] = e.sticker
+                continue
+            if sticker_data is not None:
+                updated[sticker_id] = sticker_data
+    else:
+        async with async_session_factory() as session:
+            repo = DeskDetailRepository(session)
+            stickers = await repo.update_many(
+                desk_uuid,
+                {
+                    uuid.UUID(sticker_id): sticker_fields_to_columns(pending.fields)
+                    for sticker_id, pending in updates.items()
+                },
+                {
+                    uuid.UUID(sticker_id): pending.version
+                    for sticker_id, pending in updates.items()
+                    if pending.version is not None
+                },
+            )
+            updated = {str(s.id): sticker_to_dict(s) for s in stickers}
+
+            # not updated: either gone or stale, only the latter still exists
+            checked = [
+                uuid.UUID(sticker_id)
+                for sticker_id, pending in updates.items()
+                if sticker_id not in updated and pending.version is not None
+            ]
+            if checked:
+                conflicts = {
+                    str(s.id): sticker_to_dict(s)
+                    for s in await repo.get_by_ids(desk_uuid, checked)
+                }
+
+    for sticker_id, pending in updates.items():
+        if sticker_id in conflicts:
+            for conn in pending.conns:
+                conn.send({
+                    "event": "error",
+                    "data": {
+                        "code": "CONFLICT",
+                        "message": "Sticker was changed by someone else",
+                        "sticker": conflicts[sticker_id],
+                    },
+                })
+            continue
+
+        sticker_data = updated.get(sticker_id)
+        if sticker_data is None:
+            for conn in pending.conns:
+                conn.send({
+                    "event": "error",
+                    "data": {"code": "NOT_FOUND", "message": "Sticker not found"},
+                })
+            continue
+
+        # a replaced text can't be merged with edits made before it
+        text_history.record(
+            sticker_id, sticker_data["version"], None if "text" in pending.fields else []
+        )
+        # only what changed: a drag doesn't resend the text
+        await manager.broadcast_to_desk(desk_id, {
+            "event": "sticker:updated",
+            "data": {
+                "sticker_id": sticker_id,
+                **{key: sticker_data[key] for key in pending.fields},
+                "version": sticker_data["version"],
+            },
+        })
+
+
+coalescer.set_handler(apply_sticker_updates)
 
 
 async def handle_sticker_delete(
-        ws: WebSocket,
+        conn: DeskConnection,
         desk_id: str,
         desk_uuid: uuid.UUID,
         data: dict,
-        repo: DeskDetailRepository,
 ):
     sticker_id_str = data.get("sticker_id")
     if not sticker_id_str:
-        await ws.send_json({
+        conn.send({
             "event": "error",
             "data": {"code": "VALIDATION_ERROR", "message": "sticker_id required"},
         })
@@ -206,23 +908,232 @@ async def handle_sticker_delete(
     try:
         sticker_id = uuid.UUID(sticker_id_str)
     except ValueError:
-        await ws.send_json({
+        conn.send({
             "event": "error",
             "data": {"code": "VALIDATION_ERROR", "message": "Invalid sticker_id format"},
         })
         return
 
-    sticker = await repo.get_by_id(sticker_id)
-    if not sticker or sticker.desk_id != desk_uuid:
-        await ws.send_json({
+    async with coalescer.exclusive(desk_id):
+        # drop merged updates of the sticker, apply those of others first
+        coalescer.discard(desk_id, str(sticker_id))
+        await coalescer.flush_locked(desk_id)
+        text_history.discard(str(sticker_id))
+
+        if desk_state.enabled:
+            if not desk_state.delete(desk_uuid, str(sticker_id)):
+                conn.send({
+                    "event": "error",
+                    "data": {"code": "NOT_FOUND", "message": "Sticker not found"},
+                })
+                return
+        else:
+            async with async_session_factory() as session:
+                found = await DeskDetailRepository(session).delete(desk_uuid, sticker_id)
+            if not found:
+                conn.send({
+                    "event": "error",
+                    "data": {"code": "NOT_FOUND", "message": "Sticker not found"},
+                })
+                return
+
+        await manager.broadcast_to_desk(desk_id, {
+            "event": "sticker:deleted",
+            "data": {"sticker_id": str(sticker_id)},
+        })
+
+
+async def handle_batch(
+        conn: DeskConnection,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        data: dict,
+):
+    """Apply an ordered list of sticker ops in one transaction.
+
+    Either every op is applied and one batch:applied frame is broadcast,
+    or nothing is applied and the sender gets the failing ops by index.
+    """
+    ops = data.get("ops")
+    if not isinstance(ops, list) or not ops:
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": "ops required"},
+        })
+        return
+
+    if len(ops) > settings.WS_BATCH_MAX_OPS:
+        conn.send({
             "event": "error",
-            "data": {"code": "NOT_FOUND", "message": "Sticker not found"},
+            "data": {
+                "code": "VALIDATION_ERROR",
+                "message": f"Batch is limited to {settings.WS_BATCH_MAX_OPS} ops",
+            },
         })
         return
 
-    await repo.delete(sticker)
+    errors: list[dict] = []
+    creates: list[tuple[str | None, dict]] = []
+    # sticker id -> (index of the last op, merged fields)
+    updates: dict[str, tuple[int, dict]] = {}
+    deletes: dict[str, int] = {}
 
-    await manager.broadcast_to_desk(desk_id, {
-        "event": "sticker:deleted",
-        "data": {"sticker_id": str(sticker_id)},
-    })
\ No newline at end of file
+    for index, op in enumerate(ops):
+        op = op if isinstance(op, dict) else {}
+        event = op.get("event")
+        op_data = op.get("data") or {}
+
+        if event == "sticker:create":
+            try:
+                creates.append((op_data.get("temp_id"), new_sticker_data(op_data)))
+            except ValueError as e:
+                errors.append({"index": index, "code": "VALIDATION_ERROR", "message": str(e)})
+            continue
+
+        if event not in ("sticker:update", "sticker:delete"):
+            errors.append({"index": index, "code": "UNKNOWN_EVENT", "message": "Unknown event"})
+            continue
+
+        try:
+            sticker_id = str(uuid.UUID(op_data.get("sticker_id")))
+        except (TypeError, ValueError):
+            errors.append({
+                "index": index,
+                "code": "VALIDATION_ERROR",
+                "message": "Invalid sticker_id format",
+            })
+            continue
+
+        if sticker_id in deletes:
+            errors.append({
+                "index": index,
+                "code": "NOT_FOUND",
+                "message": "Sticker is deleted earlier in the batch",
+            })
+            continue
+
+        if event == "sticker:delete":
+            # the delete wins over earlier updates of the same sticker
+            updates.pop(sticker_id, None)
+            deletes[sticker_id] = index
+            continue
+
+        if "text_ops" in op_data:
+            errors.append({
+                "index": index,
+                "code": "VALIDATION_ERROR",
+                "message": "text_ops are not supported in a batch",
+            })
+            continue
+
+        try:
+            changed = sticker_fields(op_data)
+        except ValueError as e:
+            errors.append({"index": index, "code": "VALIDATION_ERROR", "message": str(e)})
+            continue
+
+        fields = updates[sticker_id][1] if sticker_id in updates else {}
+        fields.update(changed)
+        updates[sticker_id] = (index, fields)
+
+    if errors:
+        conn.send({
+            "event": "error",
+            "data": {"code": "VALIDATION_ERROR", "message": "Invalid batch", "errors": errors},
+        })
+        return
+
+    async with coalescer.exclusive(desk_id):
+        # updates still waiting for their tick go first, and no tick
+        # gets between this write and its broadcast
+        await coalescer.flush_locked(desk_id)
+
+        if desk_state.enabled:
+            state = desk_state.get(desk_uuid)
+            missing = [
+                sticker_id
+                for sticker_id in [*updates, *deletes]
+                if state is None or sticker_id not in state.stickers
+            ]
+            if not missing:
+                created = [desk_state.create(desk_uuid, sticker) for _, sticker in creates]
+                updated = [
+                    desk_state.update(desk_uuid, sticker_id, fields)
+                    for sticker_id, (_, fields) in updates.items()
+                ]
+                for sticker_id in deletes:
+                    desk_state.delete(desk_uuid, sticker_id)
+                deleted = list(deletes)
+        else:
+            async with async_session_factory() as session:
+                try:
+                    rows_created, rows_updated, rows_deleted = await DeskDetailRepository(
+                        session
+                    ).apply_batch(
+                        desk_uuid,
+                        [sticker_data_to_row(desk_uuid, sticker) for _, sticker in creates],
+                        {
+                            uuid.UUID(sticker_id): sticker_fields_to_columns(fields)
+                            for sticker_id, (_, fields) in updates.items()
+                        },
+                        [uuid.UUID(sticker_id) for sticker_id in deletes],
+                    )
+                    missing = []
+                except StickersNotFoundError as e:
+                    missing = [str(sticker_id) for sticker_id in e.sticker_ids]
+            if not missing:
+                created_by_id = {str(s.id): sticker_to_dict(s) for s in rows_created}
+                created = [created_by_id[sticker["id"]] for _, sticker in creates]
+                updated = [sticker_to_dict(s) for s in rows_updated]
+                deleted = [str(sticker_id) for sticker_id in rows_deleted]
+
+        if not missing:
+            for sticker in updated:
+                text_history.record(
+                    sticker["id"],
+                    sticker["version"],
+                    None if "text" in updates[sticker["id"]][1] else [],
+                )
+            for sticker_id in deleted:
+                text_history.discard(sticker_id)
+
+        if missing:
+            conn.send({
+                "event": "error",
+                "data": {
+                    "code": "NOT_FOUND",
+                    "message": "Sticker not found",
+                    "errors": sorted(
+                        (
+                            {
+                                "index": updates[sticker_id][0] if sticker_id in updates else deletes[sticker_id],
+                                "code": "NOT_FOUND",
+                                "message": "Sticker not found",
+                            }
+                            for sticker_id in missing
+                        ),
+                        key=lambda error: error["index"],
+                    ),
+                },
+            })
+            return
+
+        await manager.broadcast_to_desk(desk_id, {
+            "event": "batch:applied",
+            "data": {
+                "batch_id": data.get("batch_id"),
+                "created": [
+                    {"temp_id": temp_id, "sticker": sticker}
+                    for (temp_id, _), sticker in zip(creates, created)
+                ],
+                "updated": [
+                    {
+                        "sticker_id": sticker["id"],
+                        **{key: sticker[key] for key in updates[sticker["id"]][1]},
+                        "version": sticker["version"],
+                    }
+                    for sticker in updated
+                ],
+                "deleted": deleted,
+            },
+        }, origin=conn)
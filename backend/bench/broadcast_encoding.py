@@ -0,0 +1,46 @@
+"""Encoding cost of one sticker:updated broadcast to N recipients.
+
+Run from backend/: python -m bench.broadcast_encoding
+"""
+import json
+import timeit
+import uuid
+
+from core.encoding import Frame, orjson
+
+MESSAGE = {
+    "event": "sticker:updated",
+    "data": {
+        "sticker_id": str(uuid.uuid4()),
+        "coord": {"x": 350, "y": 120},
+        "size": {"width": 200, "height": 150},
+        "color": "#4CAF50",
+        "text": "WebSocket подключение " * 4,
+    },
+}
+
+
+def per_recipient(n: int) -> None:
+    # what WebSocket.send_json did for every socket
+    for _ in range(n):
+        json.dumps(MESSAGE, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_once(n: int) -> None:
+    frame = Frame(MESSAGE)
+    for _ in range(n):
+        frame.text
+
+
+def main() -> None:
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'recipients':>10} {'before, us':>12} {'after, us':>12} {'speedup':>8}")
+    for n in (1, 10, 50, 200, 1000):
+        number = max(10, 20000 // n)
+        before = timeit.timeit(lambda: per_recipient(n), number=number) / number
+        after = timeit.timeit(lambda: encode_once(n), number=number) / number
+        print(f"{n:>10} {before * 1e6:>12.1f} {after * 1e6:>12.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""desk:init payload and time to first render, full vs init=light.
+
+A board of 5k stickers with retro-style notes of 300-1500 characters is
+generated the way sticker_to_dict shapes them. Time to first render is
+estimated as server encoding + transfer at the given bandwidth + client
+decoding of everything the client needs before it can draw: the whole
+desk:init, or the first chunk with init=stream.
+
+Run from backend/: python -m bench.light_init
+"""
+import random
+import timeit
+import uuid
+
+from api.utils import light_sticker
+from core.config import settings
+from core.encoding import Frame, loads, msgpack, unpack
+
+STICKERS = 5000
+BANDWIDTHS_MBIT = (10, 50)
+WORDS = (
+    "что прошло хорошо релиз задержали из-за ревью нужно раньше договориться "
+    "о контрактах api тесты падали на ci дважды переписали миграции команда "
+    "помогала друг другу созвоны затягивались договорились о таймбоксе"
+).split()
+
+
+def board() -> list[dict]:
+    stickers = []
+    for i in range(STICKERS):
+        length = random.randint(300, 1500)
+        text = ""
+        while len(text) < length:
+            text += random.choice(WORDS) + " "
+        stickers.append({
+            "id": str(uuid.uuid4()),
+            "coord": {"x": (i % 100) * 220, "y": (i // 100) * 170},
+            "size": {"width": 200, "height": 150},
+            "color": "#FFEB3B",
+            "text": text[:length],
+            "version": 1,
+        })
+    return stickers
+
+
+def init_message(stickers: list[dict]) -> dict:
+    return {"event": "desk:init", "data": {"stickers": stickers, "epoch": "e", "version": 1}}
+
+
+def measure(message: dict, binary: bool) -> tuple[int, float, float]:
+    """Bytes, encode ms and decode ms of one message."""
+    def encode():
+        frame = Frame(message)
+        return frame.binary if binary else frame.text
+
+    payload = encode()
+    encode_ms = min(timeit.repeat(encode, number=1, repeat=5)) * 1000
+    decode = (lambda: unpack(payload)) if binary else (lambda: loads(payload))
+    decode_ms = min(timeit.repeat(decode, number=1, repeat=5)) * 1000
+    size = len(payload) if binary else len(payload.encode())
+    return size, encode_ms, decode_ms
+
+
+def main() -> None:
+    random.seed(1)
+    stickers = board()
+    light = [light_sticker(s) for s in stickers]
+    chunk = settings.DESK_INIT_CHUNK_SIZE
+    cases = [
+        ("full", init_message(stickers)),
+        ("light", init_message(light)),
+        ("full, 1st chunk", {"event": "desk:init:chunk", "data": {"stickers": stickers[:chunk]}}),
+        ("light, 1st chunk", {"event": "desk:init:chunk", "data": {"stickers": light[:chunk]}}),
+    ]
+
+    print(f"{STICKERS} stickers, preview {settings.STICKER_TEXT_PREVIEW_CHARS} chars, chunk {chunk}")
+    header = f"{'init':>16} {'proto':>7} {'KiB':>8} {'enc, ms':>8} {'dec, ms':>8}"
+    print(header + "".join(f" {f'ttfr@{b}M, ms':>14}" for b in BANDWIDTHS_MBIT))
+    for name, message in cases:
+        for binary in (False, True):
+            if binary and msgpack is None:
+                continue
+            size, encode_ms, decode_ms = measure(message, binary)
+            ttfr = [
+                encode_ms + size * 8 / (mbit * 1_000_000) * 1000 + decode_ms
+                for mbit in BANDWIDTHS_MBIT
+            ]
+            print(
+                f"{name:>16} {'msgpack' if binary else 'json':>7} {size / 1024:>8.0f} "
+                f"{encode_ms:>8.1f} {decode_ms:>8.1f}" + "".join(f" {t:>14.0f}" for t in ttfr)
+            )
+
+    # what a client zoomed in on ~100 stickers fetches afterwards
+    fetched = {
+        "event": "sticker:fetched",
+        "data": {
+            "stickers": [
+                {"id": s["id"], "text": s["text"], "version": s["version"]}
+                for s in stickers[:100]
+            ],
+            "missing": [],
+        },
+    }
+    print(f"sticker:fetched for 100 stickers: {len(Frame(fetched).text.encode()) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""WebSocket broadcast latency during a burst of logins.
+
+A desk with 50 sockets gets a broadcast every 10 ms while 20 logins run
+bcrypt. Latency is the time from broadcast_to_desk until the last socket
+of the desk has the frame, measured with bcrypt on the event loop
+(as login did before) and in the password hasher's thread pool.
+
+Run from backend/: python -m bench.login_burst
+"""
+import asyncio
+import statistics
+import time
+
+from core.connmanager import manager
+from core.security import get_password_hash, password_hasher, verify_password
+from service.exception import PasswordHasherBusyError
+
+SOCKETS = 50
+LOGINS = 20
+INTERVAL = 0.01
+
+
+class FakeSocket:
+    def __init__(self) -> None:
+        self.received: list[float] = []
+
+    async def send_text(self, text: str) -> None:
+        self.received.append(time.perf_counter())
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+async def run(desk_id: str, login) -> list[float]:
+    sockets = [FakeSocket() for _ in range(SOCKETS)]
+    conns = [await manager.add_connection(desk_id, ws) for ws in sockets]
+    latencies: list[float] = []
+    done = False
+
+    async def broadcaster() -> None:
+        n = 0
+        due = time.perf_counter()
+        while not done:
+            n += 1
+            await manager.broadcast_to_desk(desk_id, {"event": "tick", "data": {"n": n}})
+            while not all(len(ws.received) >= n for ws in sockets):
+                await asyncio.sleep(0)
+            # from when the frame was due until the last socket wrote it,
+            # so a blocked event loop shows up as latency
+            latencies.append(max(ws.received[n - 1] for ws in sockets) - due)
+            due = time.perf_counter() + INTERVAL
+            await asyncio.sleep(INTERVAL)
+
+    task = asyncio.create_task(broadcaster())
+    await asyncio.sleep(0.1)
+    await asyncio.gather(*(login() for _ in range(LOGINS)))
+    done = True
+    await task
+    for conn in conns:
+        await manager.disconnect(desk_id, conn)
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    ms = sorted(x * 1000 for x in latencies)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(
+        f"{name:>12} {len(ms):>7} {statistics.median(ms):>8.2f} "
+        f"{p99:>8.2f} {ms[-1]:>8.2f}"
+    )
+
+
+async def main() -> None:
+    hashed = get_password_hash("password")
+
+    async def inline_login() -> None:
+        verify_password("password", hashed)
+        await asyncio.sleep(0)
+
+    async def pooled_login() -> None:
+        try:
+            await password_hasher.verify("password", hashed)
+        except PasswordHasherBusyError:
+            pass  # answered with 503 right away
+
+    print(f"{SOCKETS} sockets, {LOGINS} logins, broadcast every {INTERVAL * 1000:.0f} ms")
+    print(f"{'bcrypt':>12} {'frames':>7} {'p50, ms':>8} {'p99, ms':>8} {'max, ms':>8}")
+    report("event loop", await run("00000000-0000-0000-0000-000000000001", inline_login))
+    report("thread pool", await run("00000000-0000-0000-0000-000000000002", pooled_login))
+    print(f"rejected with 503: {password_hasher.stats()['rejected']}")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
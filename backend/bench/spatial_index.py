@@ -0,0 +1,62 @@
+"""Cost of keeping the viewport grid up to date and of querying it.
+
+Run from backend/: python -m bench.spatial_index
+"""
+import random
+import timeit
+
+from core.config import settings
+from core.spatial import GridIndex
+
+# desk area grows with the sticker count, roughly 1 sticker per 300x300
+SPACING = 300
+VIEWPORT = (1920, 1080)
+
+
+def build(n: int) -> tuple[GridIndex, list[tuple[float, float]]]:
+    side = int((n ** 0.5) * SPACING)
+    index = GridIndex(settings.VIEWPORT_GRID_CELL)
+    points = [(random.uniform(0, side), random.uniform(0, side)) for _ in range(n)]
+    for i, (x, y) in enumerate(points):
+        index.upsert(str(i), (x, y, x + 200, y + 150))
+    return index, points
+
+
+def main() -> None:
+    print(f"cell: {settings.VIEWPORT_GRID_CELL}, viewport: {VIEWPORT[0]}x{VIEWPORT[1]}")
+    print(f"{'stickers':>9} {'build, ms':>10} {'move, us':>9} {'query, us':>10} {'scan, us':>10}")
+    for n in (10_000, 100_000):
+        started = timeit.default_timer()
+        index, points = build(n)
+        build_ms = (timeit.default_timer() - started) * 1000
+        side = int((n ** 0.5) * SPACING)
+        keys = [str(i) for i in random.sample(range(n), 1000)]
+
+        def move() -> None:
+            # a drag step: small offset, usually stays in the same cells
+            for key in keys:
+                x0, y0, _, _ = index.rect(key)
+                x, y = x0 + random.uniform(-20, 20), y0 + random.uniform(-20, 20)
+                index.upsert(key, (x, y, x + 200, y + 150))
+
+        def query() -> None:
+            x, y = random.uniform(0, side), random.uniform(0, side)
+            index.query((x, y, x + VIEWPORT[0], y + VIEWPORT[1]))
+
+        def scan() -> None:
+            # what scoping costs without the index
+            x, y = random.uniform(0, side), random.uniform(0, side)
+            rect = (x, y, x + VIEWPORT[0], y + VIEWPORT[1])
+            [
+                i for i, (px, py) in enumerate(points)
+                if px <= rect[2] and rect[0] <= px + 200 and py <= rect[3] and rect[1] <= py + 150
+            ]
+
+        move_us = timeit.timeit(move, number=20) / 20 / len(keys) * 1e6
+        query_us = timeit.timeit(query, number=200) / 200 * 1e6
+        scan_us = timeit.timeit(scan, number=5) / 5 * 1e6
+        print(f"{n:>9} {build_ms:>10.1f} {move_us:>9.2f} {query_us:>10.1f} {scan_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""/users/search over a generated table of 1M users.
+
+Needs the dev database from docker-compose with pg_trgm available. Users
+are generated in a scratch schema (dropped at the end), so the real user
+table is not touched. Times the old unindexed ILIKE query, the ranked
+search before and after building the search indexes, and a cache hit.
+
+Run from backend/: python -m bench.user_search
+"""
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateIndex
+
+from core.database import engine
+from core.usercache import search_cache, search_cached_users
+from model import User
+from repository.user import UserRepository
+
+USERS = 1_000_000
+LIMIT = 10
+RUNS = 20
+SCHEMA = "bench_user_search"
+QUERIES = ("maria", "sidorov", "ivan.petrov12345", "gmail", "zz", "qwerty")
+
+FIRST = "ARRAY['Ivan','Maria','Alexey','Olga','Dmitry','Anna','Sergey','Elena','Pavel','Daria']"
+LAST = (
+    "ARRAY['Petrov','Sidorova','Marin','Ivanova','Smirnov',"
+    "'Kuznetsova','Popov','Volkova','Sokolov','Lebedeva']"
+)
+DOMAIN = "ARRAY['example.com','mail.ru','gmail.com']"
+
+
+async def median_ms(call) -> float:
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        await call()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+async def run_queries(name: str, search) -> None:
+    cells = []
+    for q in QUERIES:
+        cells.append(f"{await median_ms(lambda: search(q)):>17.2f}")
+    print(f"{name:>16} " + " ".join(cells))
+
+
+async def main() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+        await conn.execute(text('CREATE TABLE "user" (LIKE public."user" INCLUDING DEFAULTS)'))
+
+        started = time.perf_counter()
+        await conn.execute(text(f"""
+            INSERT INTO "user" (id, created_at, name, email, pass_hash)
+            SELECT gen_random_uuid(), current_date,
+                   ({FIRST})[1 + i % 10] || ' ' || ({LAST})[1 + i / 10 % 10],
+                   lower(({FIRST})[1 + i % 10] || '.' || ({LAST})[1 + i / 10 % 10])
+                       || i || '@' || ({DOMAIN})[1 + i % 3],
+                   'x'
+            FROM generate_series(1, {USERS}) AS i
+        """))
+        await conn.execute(text('ANALYZE "user"'))
+        await conn.commit()
+        print(f"generated {USERS} users in {time.perf_counter() - started:.1f} s")
+
+        session = AsyncSession(bind=conn)
+        repo = UserRepository(session)
+
+        async def old_search(q: str) -> None:
+            await session.execute(select(User).where(User.email.ilike(f"%{q}%")).limit(LIMIT))
+
+        async def ranked_search(q: str) -> None:
+            await repo.search(q, LIMIT)
+
+        print(f"median of {RUNS} runs, ms, limit {LIMIT}")
+        print(f"{'':>16} " + " ".join(f"{q:>17}" for q in QUERIES))
+        await run_queries("old ILIKE", old_search)
+        await run_queries("ranked, no index", ranked_search)
+
+        started = time.perf_counter()
+        for index in User.__table__.indexes:
+            await conn.execute(CreateIndex(index))
+        await conn.execute(text('ANALYZE "user"'))
+        await conn.commit()
+        print(f"built search indexes in {time.perf_counter() - started:.1f} s")
+
+        await run_queries("ranked, indexed", ranked_search)
+
+        async def cached_search(q: str) -> None:
+            await search_cached_users(q, LIMIT, repo.search)
+
+        search_cache.clear()
+        await run_queries("cached", cached_search)
+        print(f"cache: {search_cache.stats()}")
+
+        await session.close()
+        await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await conn.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
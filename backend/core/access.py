@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import uuid
+from typing import Optional
+
+from core import metrics
+from core.cache import TTLCache
+from core.config import settings
+from core.connmanager import manager
+from core.database import async_session_factory
+from repository.desk_share import DeskShareRepository
+
+# (user_id, desk_id) -> bool, per worker
+access_cache = TTLCache(settings.ACCESS_CACHE_TTL_S, settings.ACCESS_CACHE_SIZE)
+
+
+async def has_desk_access(user_id: uuid.UUID, desk_id: uuid.UUID) -> bool:
+    """Owner or shared access, cached for ACCESS_CACHE_TTL_S."""
+    async def load() -> bool:
+        async with async_session_factory() as session:
+            return await DeskShareRepository(session).has_access(user_id, desk_id)
+
+    return await access_cache.get_or_load((user_id, desk_id), load)
+
+
+def invalidate_access(desk_id: uuid.UUID, user_id: Optional[uuid.UUID] = None) -> None:
+    """Forget cached checks of a user on a desk, or of every user if user_id is None."""
+    if user_id is not None:
+        access_cache.invalidate((user_id, desk_id))
+    else:
+        access_cache.invalidate_where(lambda key: key[1] == desk_id)
+
+
+async def grant_access(desk_id: uuid.UUID, user_id: uuid.UUID) -> None:
+    """Invalidate cached checks of a user on a desk on every worker, e.g. after sharing it."""
+    invalidate_access(desk_id, user_id)
+    await manager.access_changed(str(desk_id), str(user_id))
+
+
+async def revoke_access(
+    desk_id: uuid.UUID, user_id: Optional[uuid.UUID] = None, reason: str = "Access revoked"
+) -> None:
+    """Invalidate access and close the affected desk sockets right away."""
+    invalidate_access(desk_id, user_id)
+    await manager.revoke(str(desk_id), str(user_id) if user_id is not None else None, reason)
+
+
+def _on_remote_revoke(desk_id: str, user_id: Optional[str]) -> None:
+    invalidate_access(uuid.UUID(desk_id), uuid.UUID(user_id) if user_id else None)
+
+
+manager.set_revoke_handler(_on_remote_revoke)
+metrics.register("access_cache", access_cache.stats)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# returned by TTLCache.get on a miss, cached values may be falsy
+MISSING = object()
+
+
+class TTLCache:
+    """In-process cache with per-entry expiry; least recently used dropped first."""
+
+    def __init__(self, ttl_s: float, max_size: int) -> None:
+        self.ttl = ttl_s
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # misses being loaded, later callers wait for the same load
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        # bumped on every invalidation so a load racing with it isn't stored
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[1]
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value, or the result of `load()` with one load per key at a time."""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        loading = self._loading.get(key)
+        if loading is not None:
+            self._coalesced += 1
+            return await asyncio.shield(loading)
+
+        loading = self._loading[key] = asyncio.get_running_loop().create_future()
+        generation = self._generation
+        try:
+            value = await load()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                loading.set_exception(e)
+                # retrieved here in case nobody else was waiting
+                loading.exception()
+            else:
+                loading.cancel()
+            raise
+        finally:
+            if self._loading.get(key) is loading:
+                del self._loading[key]
+
+        if generation == self._generation:
+            self.set(key, value)
+        loading.set_result(value)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_s: Optional[float] = None) -> None:
+        """Store a value; `ttl_s` overrides the cache TTL for this entry."""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl_s is None else ttl_s), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._generation += 1
+        # a load started before this may return stale data, don't join it
+        self._loading.pop(key, None)
+        if self._entries.pop(key, None) is not None:
+            self._invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key matches, e.g. all users of a desk."""
+        self._generation += 1
+        for key in [k for k in self._loading if predicate(k)]:
+            del self._loading[key]
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._loading.clear()
+        self._invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self._invalidations,
+        }
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from loguru import logger
+
+from core import metrics
+from core.config import settings
+
+
+class PendingUpdate:
+    """Fields of one sticker changed during the current tick."""
+
+    __slots__ = ("fields", "version", "conns")
+
+    def __init__(self) -> None:
+        self.fields: dict[str, Any] = {}
+        # version the senders based their edits on, None skips the check
+        self.version: Optional[int] = None
+        # senders to notify if the sticker turns out to be gone
+        self.conns: Set[Any] = set()
+
+
+UpdateHandler = Callable[[str, uuid.UUID, Dict[str, PendingUpdate]], Awaitable[None]]
+
+
+class UpdateCoalescer:
+    """Merges sticker:update events of a desk received within one tick.
+
+    Updates of the same sticker are merged field by field (last value wins)
+    and handed to the handler once per tick, so a drag costs one write and
+    one broadcast per tick instead of one per mouse event.
+    """
+
+    def __init__(self, tick_ms: int) -> None:
+        self.tick = tick_ms / 1000
+        self._handler: Optional[UpdateHandler] = None
+        self._pending: Dict[str, Dict[str, PendingUpdate]] = {}
+        self._desk_uuids: Dict[str, uuid.UUID] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, list] = {}
+        self._received = 0
+        self._applied = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.tick > 0
+
+    def set_handler(self, handler: UpdateHandler) -> None:
+        self._handler = handler
+
+    def submit(
+        self,
+        desk_id: str,
+        desk_uuid: uuid.UUID,
+        sticker_id: str,
+        fields: dict[str, Any],
+        conn: Any,
+        version: Optional[int] = None,
+    ) -> None:
+        self._received += 1
+        desk = self._pending.setdefault(desk_id, {})
+        self._desk_uuids[desk_id] = desk_uuid
+        pending = desk.get(sticker_id)
+        if pending is None:
+            pending = desk[sticker_id] = PendingUpdate()
+        pending.fields.update(fields)
+        pending.conns.add(conn)
+        if version is not None and (pending.version is None or version < pending.version):
+            pending.version = version
+
+        if desk_id not in self._timers:
+            self._timers[desk_id] = asyncio.create_task(self._tick(desk_id))
+
+    def discard(self, desk_id: str, sticker_id: str) -> None:
+        """Forget pending changes of a sticker, e.g. because it is being deleted."""
+        desk = self._pending.get(desk_id)
+        if desk is not None:
+            desk.pop(sticker_id, None)
+
+    async def _tick(self, desk_id: str) -> None:
+        await asyncio.sleep(self.tick)
+        if self._timers.get(desk_id) is asyncio.current_task():
+            del self._timers[desk_id]
+        await self.flush(desk_id)
+
+    @asynccontextmanager
+    async def exclusive(self, desk_id: str) -> AsyncIterator[None]:
+        """Hold the desk's apply lock; flushes and other holders wait meanwhile."""
+        entry = self._locks.get(desk_id)
+        if entry is None:
+            entry = self._locks[desk_id] = [asyncio.Lock(), 0]
+        # holders and waiters, the lock is dropped when none are left
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[desk_id]
+
+    async def flush(self, desk_id: str) -> None:
+        """Apply pending updates of a desk now."""
+        # one flush per desk at a time, so ticks are applied in order
+        async with self.exclusive(desk_id):
+            await self.flush_locked(desk_id)
+
+    async def flush_locked(self, desk_id: str) -> None:
+        """flush() for callers already inside exclusive(desk_id)."""
+        batch = self._pending.pop(desk_id, None)
+        desk_uuid = self._desk_uuids.pop(desk_id, None)
+        if batch and desk_uuid is not None and self._handler is not None:
+            self._applied += len(batch)
+            try:
+                await self._handler(desk_id, desk_uuid, batch)
+            except Exception as e:
+                logger.error("Applying coalesced updates of desk {} failed: {}", desk_id, e)
+
+    async def stop(self) -> None:
+        for task in self._timers.values():
+            task.cancel()
+        self._timers.clear()
+        for desk_id in list(self._pending):
+            await self.flush(desk_id)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "tick_ms": self.tick * 1000,
+            "received": self._received,
+            "applied": self._applied,
+            "pending_desks": len(self._pending),
+        }
+
+
+coalescer = UpdateCoalescer(settings.STICKER_UPDATE_TICK_MS)
+metrics.register("update_coalescer", coalescer.stats)
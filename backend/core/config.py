@@ -59,11 +59,78 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # bearer token of GET /metrics scrapers, unset keeps the endpoint disabled
+    METRICS_TOKEN: str | None = None
+
     # jwt settings
     JWT_SECRET: str
     JWT_ALG: str
     ACCESS_TOKEN_TTL: int
     REFRESH_TOKEN_TTL: int
+    # decoded token payloads kept until their exp, skips signature checks
+    TOKEN_CACHE_SIZE: int = 100_000
+    # how often each worker pulls session deactivations made by the others
+    SESSION_SYNC_INTERVAL_S: int = 5
+    # deactivated sessions are kept this long, expired ones go after REFRESH_TOKEN_TTL
+    SESSION_RETENTION_DAYS: int = 7
+    # the janitor deletes old sessions in batches of this size with a pause between
+    SESSION_JANITOR_INTERVAL_S: int = 3600
+    SESSION_JANITOR_BATCH: int = 1000
+    SESSION_JANITOR_PAUSE_MS: int = 200
+
+    # bcrypt runs in this many threads, off the event loop
+    PASSWORD_HASH_WORKERS: int = 4
+    # hash/verify calls allowed to wait for a thread before answering 503
+    PASSWORD_HASH_QUEUE: int = 32
+
+    # websocket settings
+    # "memory" for a single worker, "postgres" to fan out between workers
+    PUBSUB_BACKEND: str = "memory"
+    # outbound frames buffered per socket before it is dropped as too slow
+    WS_SEND_QUEUE_SIZE: int = 256
+    # max time a frame may wait in the queue or take to send
+    WS_SEND_LATENCY_LIMIT_MS: int = 5000
+    # desks one multiplexed socket may subscribe to
+    WS_MAX_SUBSCRIPTIONS: int = 50
+
+    # keep open desks in memory and write stickers back in batches
+    DESK_STATE_ENGINE: bool = False
+    DESK_STATE_FLUSH_INTERVAL_MS: int = 1000
+    # flush early once this many stickers of a desk are waiting
+    DESK_STATE_FLUSH_SIZE: int = 500
+
+    # sticker:update events of a desk within one tick are merged, 0 disables
+    STICKER_UPDATE_TICK_MS: int = 40
+    # max ops in one batch event
+    WS_BATCH_MAX_OPS: int = 500
+    # recent broadcasts kept per desk for desk:resume, and desks tracked
+    DESK_OPLOG_SIZE: int = 1000
+    # and at most this much encoded text per desk, oldest dropped first
+    DESK_OPLOG_BYTES: int = 1024 * 1024
+    DESK_OPLOG_MAX_DESKS: int = 1000
+    # cell size of the per-desk grid used for viewport:set
+    VIEWPORT_GRID_CELL: int = 512
+    # encoded desk:init frames shared by clients opening the same desk
+    DESK_SNAPSHOT_CACHE_BYTES: int = 64 * 1024 * 1024
+    # stickers per desk:init:chunk frame for clients connecting with init=stream
+    DESK_INIT_CHUNK_SIZE: int = 500
+    # longer texts are sent as a preview of this many characters with init=light
+    STICKER_TEXT_PREVIEW_CHARS: int = 120
+    # max stickers in one sticker:fetch
+    STICKER_FETCH_MAX_IDS: int = 500
+    # sticker versions remembered for transforming stale text_ops, and stickers tracked
+    TEXT_HISTORY_VERSIONS: int = 200
+    TEXT_HISTORY_STICKERS: int = 10_000
+
+    # cached desk access checks, invalidated on share/revoke/delete
+    ACCESS_CACHE_TTL_S: int = 60
+    ACCESS_CACHE_SIZE: int = 100_000
+    # authenticated user projection used by get_current_user
+    USER_CACHE_TTL_S: int = 300
+    USER_CACHE_SIZE: int = 50_000
+    # /users/search results, per (query, limit)
+    USER_SEARCH_CACHE_TTL_S: int = 10
+    USER_SEARCH_CACHE_SIZE: int = 10_000
 
 
 settings = Settings()
\ No newline at end of file
@@ -1,49 +1,547 @@
 from __future__ import annotations
 
-from typing import Dict, Set, Any, Optional
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Set, Any, Optional
 from fastapi import WebSocket
+from loguru import logger
+
+from core import metrics
+from core.config import settings
+from core.encoding import Frame
+from core.oplog import OpLogRegistry
+from core.pubsub import PubSubBackend, create_backend
+from core.snapshot import SnapshotCache
+from core.spatial import Rect, SpatialView, scope_message, viewport_diff
+
+# close code for clients that can't keep up with the desk traffic
+CLOSE_SLOW_CONSUMER = 4008
+# close code for sockets whose access was revoked or whose desk was deleted
+CLOSE_ACCESS_REVOKED = 4003
+
+# control messages between workers, never sent to clients
+REVOKE_EVENT = "desk:revoke"
+# access of a user to a desk changed, cached checks are stale
+ACCESS_EVENT = "desk:access"
+
+RevokeHandler = Callable[[str, Optional[str]], None]
+
+
+class ClientConnection:
+    """Accepted WebSocket with a bounded outbound queue drained by its own writer task.
+
+    The socket of the /ws/desks/{desk_id} route carries one desk, a multiplexed one
+    any number of them, each through a DeskConnection in `desks`.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        on_close: Callable[[ClientConnection], Awaitable[None]],
+        binary: bool = False,
+        user_id: Optional[str] = None,
+        multiplexed: bool = False,
+    ) -> None:
+        self.ws = ws
+        self.user_id = user_id
+        # negotiated MessagePack subprotocol instead of JSON text frames
+        self.binary = binary
+        # desks come and go by desk:subscribe / desk:unsubscribe
+        self.multiplexed = multiplexed
+        self.desks: Dict[str, DeskConnection] = {}
+        self.closed = False
+        self.close_code: Optional[int] = None
+        self._on_close = on_close
+        self._queue: asyncio.Queue[tuple[float, Frame]] = asyncio.Queue(
+            maxsize=settings.WS_SEND_QUEUE_SIZE
+        )
+        self._writer = asyncio.create_task(self._write_loop())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def send(self, message: dict[str, Any] | Frame) -> None:
+        """Queue message without waiting for the socket."""
+        if self.closed:
+            return
+        frame = message if isinstance(message, Frame) else Frame(message)
+        try:
+            self._queue.put_nowait((time.monotonic(), frame))
+        except asyncio.QueueFull:
+            self.evict("Send queue overflow")
+
+    async def push(self, message: dict[str, Any] | Frame) -> None:
+        """Queue message, waiting for room instead of overflowing."""
+        if self.closed:
+            return
+        frame = message if isinstance(message, Frame) else Frame(message)
+        try:
+            await asyncio.wait_for(
+                self._queue.put((time.monotonic(), frame)),
+                timeout=settings.WS_SEND_LATENCY_LIMIT_MS / 1000,
+            )
+        except asyncio.TimeoutError:
+            self.evict("Send latency limit exceeded")
+
+    def evict(self, reason: str) -> None:
+        """Drop a slow client: stop writing and close with CLOSE_SLOW_CONSUMER."""
+        if self.closed:
+            return
+        logger.warning(
+            "Evicting slow websocket on desks {}: {} (queue depth {})",
+            ", ".join(self.desks) or "-", reason, self.queue_depth,
+        )
+        self._mark_closed(CLOSE_SLOW_CONSUMER)
+        asyncio.get_running_loop().create_task(self._finish_close(reason))
+
+    async def close(self, code: Optional[int] = None, reason: str = "") -> None:
+        if self.closed:
+            return
+        self._mark_closed(code)
+        await self._finish_close(reason)
+
+    def _mark_closed(self, code: Optional[int]) -> None:
+        self.closed = True
+        self.close_code = code
+        if asyncio.current_task() is not self._writer:
+            self._writer.cancel()
+
+    async def _finish_close(self, reason: str) -> None:
+        await self._on_close(self)
+        if self.close_code is not None:
+            try:
+                await asyncio.wait_for(
+                    self.ws.close(code=self.close_code, reason=reason),
+                    timeout=settings.WS_SEND_LATENCY_LIMIT_MS / 1000,
+                )
+            except Exception:
+                pass
+
+    async def _write_loop(self) -> None:
+        limit = settings.WS_SEND_LATENCY_LIMIT_MS / 1000
+        while True:
+            enqueued_at, frame = await self._queue.get()
+            if time.monotonic() - enqueued_at > limit:
+                self.evict("Send latency limit exceeded")
+                return
+            try:
+                if self.binary:
+                    await asyncio.wait_for(self.ws.send_bytes(frame.binary), timeout=limit)
+                else:
+                    await asyncio.wait_for(self.ws.send_text(frame.text), timeout=limit)
+            except asyncio.TimeoutError:
+                self.evict("Send latency limit exceeded")
+                return
+            except Exception:
+                # socket is gone, the receive loop will see the disconnect
+                await self.close()
+                return
+
+
+class DeskConnection:
+    """Subscription of a client connection to one desk.
+
+    Frames sent through it carry the desk_id next to the event, so a
+    multiplexed client can tell its desks apart.
+    """
+
+    def __init__(self, desk_id: str, client: ClientConnection) -> None:
+        self.desk_id = desk_id
+        self.client = client
+        # set by viewport:set, the client then only gets stickers inside it
+        self.viewport: Optional[Rect] = None
+        self.visible: Set[str] = set()
+        self.unsubscribed = False
+        # broadcasts kept back while the client is still getting its snapshot
+        self._held: Optional[deque[Frame]] = None
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.client.user_id
+
+    @property
+    def binary(self) -> bool:
+        return self.client.binary
+
+    @property
+    def closed(self) -> bool:
+        return self.unsubscribed or self.client.closed
+
+    @property
+    def queue_depth(self) -> int:
+        return self.client.queue_depth
+
+    def _frame(self, message: dict[str, Any] | Frame) -> Frame:
+        # broadcast frames are tagged once by the manager and shared
+        if isinstance(message, Frame):
+            return message
+        return Frame({**message, "desk_id": self.desk_id})
+
+    def send(self, message: dict[str, Any] | Frame) -> None:
+        """Queue message without waiting for the socket."""
+        if self.closed:
+            return
+        frame = self._frame(message)
+        if self._held is not None:
+            if len(self._held) >= settings.WS_SEND_QUEUE_SIZE:
+                self.client.evict("Send queue overflow")
+                return
+            self._held.append(frame)
+            return
+        self.client.send(frame)
+
+    async def push(self, message: dict[str, Any] | Frame) -> None:
+        """Queue message ahead of held ones, waiting for room instead of overflowing."""
+        if self.closed:
+            return
+        await self.client.push(self._frame(message))
+
+    def hold(self) -> None:
+        """Keep send() frames back until release(), e.g. while a snapshot is sent with push()."""
+        if self._held is None:
+            self._held = deque()
+
+    async def release(self) -> None:
+        """Queue the frames kept back by hold(), in order, then stop holding."""
+        # frames broadcast while this drains are held too and go out after
+        while self._held:
+            await self.push(self._held.popleft())
+        self._held = None
 
 
 class DeskConnectionManager:
-    def __init__(self) -> None:
-        self._desks: Dict[str, Set[WebSocket]] = {}
+    def __init__(self, backend: PubSubBackend) -> None:
+        # desk -> its subscriptions, of single-desk and multiplexed sockets alike
+        self._desks: Dict[str, Set[DeskConnection]] = {}
+        self._clients: Set[ClientConnection] = set()
+        self._backend = backend
+        self._backend.set_handler(self._deliver_remote)
+        self._oplogs = OpLogRegistry(
+            settings.DESK_OPLOG_SIZE, settings.DESK_OPLOG_BYTES, settings.DESK_OPLOG_MAX_DESKS
+        )
+        self._views: Dict[str, SpatialView] = {}
+        # desk -> loader of its view, to rebuild a view that got out of sync
+        self._view_loaders: Dict[str, Callable[[], Awaitable[list[dict[str, Any]]]]] = {}
+        self._view_reloads: Set[asyncio.Task] = set()
+        self._snapshots = SnapshotCache(settings.DESK_SNAPSHOT_CACHE_BYTES)
+        self._revoke_handler: Optional[RevokeHandler] = None
+        self._evicted = 0
+        self._revoked = 0
+        self._resumed = 0
+        self._resume_fallbacks = 0
+        self._view_failures = 0
+
+    async def start(self) -> None:
+        await self._backend.start()
+
+    async def stop(self) -> None:
+        await self._backend.stop()
 
-    async def connect(self, desk_id: str, ws: WebSocket) -> None:
+    async def connect(self, desk_id: str, ws: WebSocket) -> DeskConnection:
         """Accept WebSocket and add to desk connections."""
         await ws.accept()
-        self._desks.setdefault(desk_id, set()).add(ws)
+        return await self.add_connection(desk_id, ws)
 
-    def add_connection(self, desk_id: str, ws: WebSocket) -> None:
+    async def add_connection(
+        self,
+        desk_id: str,
+        ws: WebSocket,
+        binary: bool = False,
+        user_id: Optional[str] = None,
+    ) -> DeskConnection:
         """Add already-accepted WebSocket to desk connections."""
-        self._desks.setdefault(desk_id, set()).add(ws)
+        return await self.subscribe(self.open(ws, binary, user_id), desk_id)
 
-    def disconnect(self, desk_id: str, ws: WebSocket) -> None:
+    def open(
+        self,
+        ws: WebSocket,
+        binary: bool = False,
+        user_id: Optional[str] = None,
+        multiplexed: bool = False,
+    ) -> ClientConnection:
+        """Register an already-accepted WebSocket, not yet subscribed to any desk."""
+        client = ClientConnection(ws, self._on_client_closed, binary, user_id, multiplexed)
+        self._clients.add(client)
+        return client
+
+    async def subscribe(self, client: ClientConnection, desk_id: str) -> DeskConnection:
+        """Start delivering the desk's broadcasts to the client."""
+        conn = DeskConnection(desk_id, client)
+        if client.closed or desk_id in client.desks:
+            # gone while its access was checked, or already subscribed
+            conn.unsubscribed = True
+            return conn
+        client.desks[desk_id] = conn
         conns = self._desks.get(desk_id)
-        if not conns:
+        if conns is None:
+            conns = self._desks[desk_id] = set()
+            # first local subscriber of the desk - start receiving its events
+            await self._backend.subscribe(desk_id)
+        conns.add(conn)
+        return conn
+
+    async def unsubscribe(self, conn: DeskConnection) -> None:
+        """Stop delivering the desk's broadcasts; the socket stays open."""
+        if conn.unsubscribed:
+            return
+        conn.unsubscribed = True
+        if conn.client.desks.get(conn.desk_id) is conn:
+            del conn.client.desks[conn.desk_id]
+        conns = self._desks.get(conn.desk_id)
+        if not conns or conn not in conns:
             return
-        conns.discard(ws)
+        conns.discard(conn)
         if not conns:
-            self._desks.pop(desk_id, None)
+            self._desks.pop(conn.desk_id, None)
+            self._views.pop(conn.desk_id, None)
+            self._view_loaders.pop(conn.desk_id, None)
+            if not self._backend.local_only:
+                # events of other workers are missed from now on
+                self._oplogs.discard(conn.desk_id)
+            await self._backend.unsubscribe(conn.desk_id)
+
+    async def disconnect(self, desk_id: str, conn: DeskConnection) -> None:
+        await conn.client.close()
+
+    async def _on_client_closed(self, client: ClientConnection) -> None:
+        if client not in self._clients:
+            return
+        self._clients.discard(client)
+        if client.close_code == CLOSE_SLOW_CONSUMER:
+            self._evicted += 1
+        for conn in list(client.desks.values()):
+            await self.unsubscribe(conn)
+
+    async def view(
+        self,
+        desk_id: str,
+        load: Callable[[], Awaitable[list[dict[str, Any]]]],
+    ) -> SpatialView:
+        """Spatial view of a desk with local connections, loaded on first use."""
+        view = self._views.get(desk_id)
+        if view is None:
+            self._view_loaders[desk_id] = load
+            view = self._load_view(desk_id)
+        await asyncio.shield(view.loaded)
+        return view
+
+    def _load_view(self, desk_id: str) -> SpatialView:
+        """Start (re)building the desk's view; broadcasts meanwhile are queued in it."""
+        view = self._views[desk_id] = SpatialView(settings.VIEWPORT_GRID_CELL)
+        load = self._view_loaders[desk_id]
+
+        async def fill() -> None:
+            try:
+                view.load(await load())
+            except Exception as e:
+                if self._views.get(desk_id) is view:
+                    del self._views[desk_id]
+                view.loaded.set_exception(e)
+                # retrieved here in case nobody else was waiting
+                view.loaded.exception()
+
+        task = asyncio.get_running_loop().create_task(fill())
+        self._view_reloads.add(task)
+        task.add_done_callback(self._view_reloads.discard)
+        return view
+
+    async def snapshot(
+        self,
+        desk_id: str,
+        load: Callable[[], Awaitable[list[dict[str, Any]]]],
+        variant: Optional[str] = None,
+    ) -> Frame:
+        """desk:init frame with every sticker, loaded and encoded once per desk version.
+
+        `variant` tells apart frames built by different `load`s of the same desk.
+
+        Any broadcast to the desk invalidates it, and a frame is only reused
+        while the op log still has the (epoch, version) it was made at.
+        """
+        tag = self.version(desk_id)
+
+        async def build() -> Frame:
+            return Frame({
+                "event": "desk:init",
+                "desk_id": desk_id,
+                "data": {"stickers": await load(), "epoch": tag[0], "version": tag[1]},
+            })
+
+        return await self._snapshots.get_or_load(desk_id, tag, build, variant)
+
+    def set_viewport(
+        self, conn: DeskConnection, view: SpatialView, viewport: Optional[Rect]
+    ) -> None:
+        """Scope a connection to a viewport and send the stickers entering or leaving it."""
+        if viewport is None and conn.viewport is None:
+            return
+        visible, messages = viewport_diff(view, viewport, conn.visible)
+        conn.viewport = viewport
+        # unscoped connections get every broadcast, no need to track them
+        conn.visible = visible if viewport is not None else set()
+        for message in messages:
+            conn.send(message)
+
+    def version(self, desk_id: str) -> tuple[str, int]:
+        """Current (epoch, version) of the desk op log."""
+        log = self._oplogs.get(desk_id)
+        return log.epoch, log.version
+
+    def resume(self, conn: DeskConnection, since: int, epoch: Optional[str]) -> bool:
+        """Queue ops missed since `since` for a reconnected client.
+
+        Must be called right after subscribe, before any await, so no
+        live frame gets between the replay and the new ones. Returns False
+        when the gap is no longer in the log and a full snapshot is needed.
+        """
+        log = self._oplogs.get(conn.desk_id)
+        frames = log.since(since) if epoch == log.epoch else None
+        if frames is None:
+            self._resume_fallbacks += 1
+            return False
+
+        self._resumed += 1
+        conn.send({
+            "event": "desk:resume",
+            "data": {
+                "epoch": log.epoch,
+                "version": log.version,
+                "ops": [frame.message for frame in frames],
+            },
+        })
+        return True
 
     async def broadcast_to_desk(
         self,
         desk_id: str,
         message: dict[str, Any],
-        exclude: Optional[WebSocket] = None,
+        exclude: Optional[DeskConnection] = None,
+        origin: Optional[DeskConnection] = None,
     ) -> None:
-        conns = self._desks.get(desk_id, set())
-        dead: list[WebSocket] = []
+        """Send a desk event to every subscriber; `origin` is the one that caused it."""
+        # encoded once by the first writer, then shared by all recipients
+        frame = self._oplogs.get(desk_id).append({**message, "desk_id": desk_id})
+        self._send_local(desk_id, frame, exclude, origin)
+        await self._backend.publish(desk_id, frame)
 
-        for cws in conns:
-            if exclude is not None and cws is exclude:
-                continue
+    def set_revoke_handler(self, handler: RevokeHandler) -> None:
+        """Set the callback run when another worker revokes or changes access to a desk."""
+        self._revoke_handler = handler
+
+    async def access_changed(self, desk_id: str, user_id: Optional[str] = None) -> None:
+        """Run the revoke handler of every other worker, without closing any socket."""
+        await self._backend.publish_all(desk_id, Frame({
+            "event": ACCESS_EVENT,
+            "data": {"user_id": user_id},
+        }))
+
+    async def revoke(
+        self, desk_id: str, user_id: Optional[str] = None, reason: str = "Access revoked"
+    ) -> None:
+        """Drop a user's subscriptions to a desk, or all of them if user_id is None, everywhere."""
+        await self._close_local(desk_id, user_id, reason)
+        # workers without sockets on the desk still cache its access checks
+        await self._backend.publish_all(desk_id, Frame({
+            "event": REVOKE_EVENT,
+            "data": {"user_id": user_id, "reason": reason},
+        }))
+
+    async def _close_local(self, desk_id: str, user_id: Optional[str], reason: str) -> None:
+        if user_id is None:
+            # the desk is gone
+            self._snapshots.invalidate(desk_id)
+        for conn in list(self._desks.get(desk_id, ())):
+            if user_id is None or conn.user_id == user_id:
+                self._revoked += 1
+                if not conn.client.multiplexed:
+                    await conn.client.close(CLOSE_ACCESS_REVOKED, reason)
+                    continue
+                # other desks of the socket are not affected
+                await self.unsubscribe(conn)
+                conn.client.send({
+                    "event": "desk:unsubscribed",
+                    "desk_id": desk_id,
+                    "data": {"code": CLOSE_ACCESS_REVOKED, "reason": reason},
+                })
+
+    async def _deliver_remote(self, desk_id: str, message: dict[str, Any]) -> None:
+        """Deliver message published by another worker."""
+        if message.get("event") in (REVOKE_EVENT, ACCESS_EVENT):
+            data = message.get("data") or {}
+            if self._revoke_handler is not None:
+                self._revoke_handler(desk_id, data.get("user_id"))
+            if message.get("event") == REVOKE_EVENT:
+                await self._close_local(desk_id, data.get("user_id"), data.get("reason", ""))
+            return
+        # restamped with the version of this worker's log
+        self._send_local(desk_id, self._oplogs.get(desk_id).append(message))
+
+    def _send_local(
+        self,
+        desk_id: str,
+        frame: Frame,
+        exclude: Optional[DeskConnection] = None,
+        origin: Optional[DeskConnection] = None,
+    ) -> None:
+        self._snapshots.invalidate(desk_id)
+        view = self._views.get(desk_id)
+        if view is not None:
             try:
-                await cws.send_json(message)
-            except Exception:
-                dead.append(cws)
+                view.apply(frame.message)
+            except Exception as e:
+                # the frame is delivered regardless, the view is rebuilt
+                logger.error("Viewport mirror of desk {} is out of sync: {}", desk_id, e)
+                self._view_failures += 1
+                view = self._load_view(desk_id)
+            if not view.loaded.done():
+                # nothing to scope by until it is loaded
+                view = None
+
+        for conn in list(self._desks.get(desk_id, ())):
+            if exclude is not None and conn is exclude:
+                continue
+            if conn.viewport is None or view is None:
+                conn.send(frame)
+                continue
+            scoped = scope_message(
+                frame.message, view, conn.viewport, conn.visible, origin=conn is origin
+            )
+            if scoped is None:
+                conn.send(frame)
+            else:
+                for message in scoped:
+                    conn.send(message)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "desks": len(self._desks),
+            "connections": len(self._clients),
+            "multiplexed": sum(1 for c in self._clients if c.multiplexed),
+            "subscriptions": sum(len(c) for c in self._desks.values()),
+            # per socket, aggregated: no desk ids, same size however many are open
+            "queue_depth": queue_depth_stats([c.queue_depth for c in self._clients]),
+            "evicted": self._evicted,
+            "revoked": self._revoked,
+            "oplog_desks": len(self._oplogs),
+            "oplog_bytes": self._oplogs.bytes,
+            "resumed": self._resumed,
+            "resume_fallbacks": self._resume_fallbacks,
+            "viewport_desks": len(self._views),
+            "viewport_failures": self._view_failures,
+            "snapshots": self._snapshots.stats(),
+        }
+
 
-        for dws in dead:
-            self.disconnect(desk_id, dws)
+def queue_depth_stats(depths: list[int]) -> dict[str, int]:
+    depths = sorted(depths)
+    return {
+        "count": len(depths),
+        "max": depths[-1] if depths else 0,
+        "p99": depths[min(len(depths) - 1, len(depths) * 99 // 100)] if depths else 0,
+    }
 
 
-manager = DeskConnectionManager()
\ No newline at end of file
+manager = DeskConnectionManager(create_backend(settings.PUBSUB_BACKEND))
+metrics.register("ws", manager.stats)
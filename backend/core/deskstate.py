@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, Optional, Set
+
+from loguru import logger
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from core import metrics
+from core.config import settings
+from core.database import async_session_factory
+from model import DeskDetail
+from repository.desk_detail import DeskDetailRepository
+from service.exception import StickerVersionConflictError
+
+# rows per INSERT, keeps bind params well below the asyncpg limit
+FLUSH_BATCH_ROWS = 1000
+
+
+class DeskState:
+    """Stickers of one desk held in memory, with changes not yet written to the DB."""
+
+    def __init__(self, desk_uuid: uuid.UUID, stickers: Dict[str, dict[str, Any]]) -> None:
+        self.desk_uuid = desk_uuid
+        self.stickers = stickers
+        self.dirty: Set[str] = set()
+        self.deleted: Set[str] = set()
+        self.dirty_since: Optional[float] = None
+        self.refs = 0
+        self.flush_lock = asyncio.Lock()
+
+    def mark_dirty(self, sticker_id: str) -> None:
+        self.dirty.add(sticker_id)
+        if self.dirty_since is None:
+            self.dirty_since = time.monotonic()
+
+
+class DeskStateEngine:
+    """Authoritative in-memory desk state with write-behind persistence.
+
+    A desk is loaded on its first WebSocket connection, edits are applied in
+    memory and flushed to desk_detail in batches on a timer, when enough
+    stickers are dirty, when the last client leaves and on shutdown.
+    Holds state per process, so it needs a single worker (or sticky routing
+    of desks to workers).
+    """
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._desks: Dict[uuid.UUID, DeskState] = {}
+        self._loading: Dict[uuid.UUID, asyncio.Future[DeskState]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flushes = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        if settings.PUBSUB_BACKEND != "memory":
+            logger.warning(
+                "Desk state engine keeps desks in worker memory, "
+                "edits from other workers will not be seen"
+            )
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush_all()
+
+    async def acquire(self, desk_uuid: uuid.UUID) -> DeskState:
+        """Return desk state, loading it on the first connection."""
+        state = self._desks.get(desk_uuid)
+        if state is None:
+            loading = self._loading.get(desk_uuid)
+            if loading is None:
+                loading = asyncio.get_running_loop().create_future()
+                self._loading[desk_uuid] = loading
+                try:
+                    state = await self._load(desk_uuid)
+                    self._desks[desk_uuid] = state
+                    loading.set_result(state)
+                except Exception as e:
+                    loading.set_exception(e)
+                    raise
+                finally:
+                    self._loading.pop(desk_uuid, None)
+            else:
+                state = await asyncio.shield(loading)
+        state.refs += 1
+        return state
+
+    async def release(self, desk_uuid: uuid.UUID) -> None:
+        """Drop a connection; the last one flushes and unloads the desk."""
+        state = self._desks.get(desk_uuid)
+        if state is None:
+            return
+        state.refs -= 1
+        if state.refs > 0:
+            return
+        await self._flush_desk(state)
+        if not self._unload_if_idle(state):
+            # the flush failed: the flush loop retries it and unloads the desk then
+            logger.warning("Desk {} stays loaded until its changes are written", desk_uuid)
+
+    def get(self, desk_uuid: uuid.UUID) -> Optional[DeskState]:
+        return self._desks.get(desk_uuid)
+
+    def forget(self, desk_uuid: uuid.UUID) -> None:
+        """Drop desk state without flushing, e.g. when the desk is deleted."""
+        self._desks.pop(desk_uuid, None)
+
+    def create(self, desk_uuid: uuid.UUID, sticker: dict[str, Any]) -> dict[str, Any]:
+        state = self._desks[desk_uuid]
+        state.stickers[sticker["id"]] = sticker
+        state.deleted.discard(sticker["id"])
+        self._changed(state, sticker["id"])
+        return sticker
+
+    def update(
+        self,
+        desk_uuid: uuid.UUID,
+        sticker_id: str,
+        fields: dict[str, Any],
+        version: Optional[int] = None,
+    ) -> Optional[dict[str, Any]]:
+        """Apply changed fields; raises StickerVersionConflictError if `version` is stale."""
+        state = self._desks[desk_uuid]
+        sticker = state.stickers.get(sticker_id)
+        if sticker is None:
+            return None
+        if version is not None and sticker["version"] != version:
+            raise StickerVersionConflictError(dict(sticker))
+        sticker.update(fields)
+        sticker["version"] += 1
+        self._changed(state, sticker_id)
+        return sticker
+
+    def delete(self, desk_uuid: uuid.UUID, sticker_id: str) -> bool:
+        state = self._desks[desk_uuid]
+        if state.stickers.pop(sticker_id, None) is None:
+            return False
+        state.dirty.discard(sticker_id)
+        state.deleted.add(sticker_id)
+        if state.dirty_since is None:
+            state.dirty_since = time.monotonic()
+        self._schedule_flush(state)
+        return True
+
+    def _changed(self, state: DeskState, sticker_id: str) -> None:
+        state.mark_dirty(sticker_id)
+        self._schedule_flush(state)
+
+    def _schedule_flush(self, state: DeskState) -> None:
+        if len(state.dirty) + len(state.deleted) >= settings.DESK_STATE_FLUSH_SIZE:
+            self._wakeup.set()
+
+    def dirty_count(self) -> int:
+        return sum(len(s.dirty) + len(s.deleted) for s in self._desks.values())
+
+    async def _load(self, desk_uuid: uuid.UUID) -> DeskState:
+        from api.utils import sticker_to_dict  # api imports this module
+
+        async with async_session_factory() as session:
+            stickers = await DeskDetailRepository(session).get_by_desk_id(desk_uuid)
+        return DeskState(desk_uuid, {str(s.id): sticker_to_dict(s) for s in stickers})
+
+    async def _flush_loop(self) -> None:
+        interval = settings.DESK_STATE_FLUSH_INTERVAL_MS / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush_all()
+
+    async def flush_all(self) -> None:
+        for state in list(self._desks.values()):
+            await self._flush_desk(state)
+            # a released desk whose last flush failed goes once it succeeds
+            self._unload_if_idle(state)
+
+    def _unload_if_idle(self, state: DeskState) -> bool:
+        """Unload a desk without connections once it has nothing left to write."""
+        if state.refs > 0 or state.dirty or state.deleted:
+            return False
+        if self._desks.get(state.desk_uuid) is state:
+            del self._desks[state.desk_uuid]
+        return True
+
+    async def _flush_desk(self, state: DeskState) -> None:
+        from api.utils import sticker_data_to_row
+
+        async with state.flush_lock:
+            if not state.dirty and not state.deleted:
+                return
+
+            dirty, deleted = state.dirty, state.deleted
+            state.dirty, state.deleted = set(), set()
+            dirty_since, state.dirty_since = state.dirty_since, None
+
+            rows = [
+                sticker_data_to_row(state.desk_uuid, s)
+                for sid in dirty
+                if (s := state.stickers.get(sid)) is not None
+            ]
+
+            started = time.monotonic()
+            try:
+                async with async_session_factory() as session:
+                    async with session.begin():
+                        for i in range(0, len(rows), FLUSH_BATCH_ROWS):
+                            stmt = insert(DeskDetail).values(rows[i:i + FLUSH_BATCH_ROWS])
+                            await session.execute(
+                                stmt.on_conflict_do_update(
+                                    index_elements=[DeskDetail.id],
+                                    set_={
+                                        "x": stmt.excluded.x,
+                                        "y": stmt.excluded.y,
+                                        "width": stmt.excluded.width,
+                                        "height": stmt.excluded.height,
+                                        "color": stmt.excluded.color,
+                                        "text": stmt.excluded.text,
+                                        "version": stmt.excluded.version,
+                                        "updated_at": stmt.excluded.updated_at,
+                                    },
+                                )
+                            )
+                        if deleted:
+                            await session.execute(
+                                delete(DeskDetail).where(
+                                    DeskDetail.id.in_([uuid.UUID(i) for i in deleted])
+                                )
+                            )
+            except Exception as e:
+                # keep the changes, the next flush retries them
+                logger.error("Desk {} flush failed: {}", state.desk_uuid, e)
+                self._flush_errors += 1
+                state.dirty |= {i for i in dirty if i in state.stickers}
+                state.deleted |= deleted - state.stickers.keys()
+                state.dirty_since = dirty_since
+                return
+
+            self._flushes += 1
+            self._last_flush_ms = (time.monotonic() - started) * 1000
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        since = [s.dirty_since for s in self._desks.values() if s.dirty_since is not None]
+        return {
+            "enabled": self.enabled,
+            "desks": len(self._desks),
+            # released, kept until a failed flush is retried
+            "idle_dirty_desks": sum(1 for s in self._desks.values() if s.refs <= 0),
+            "dirty_stickers": self.dirty_count(),
+            "flush_lag_ms": round((now - min(since)) * 1000, 1) if since else 0.0,
+            "flushes": self._flushes,
+            "flush_errors": self._flush_errors,
+            "last_flush_ms": round(self._last_flush_ms, 1),
+        }
+
+
+desk_state = DeskStateEngine(settings.DESK_STATE_ENGINE)
+metrics.register("desk_state", desk_state.stats)
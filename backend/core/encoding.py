@@ -0,0 +1,120 @@
+import json
+import sys
+import uuid
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to stdlib json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, without it only JSON is offered
+    msgpack = None
+
+# binary WebSocket subprotocol: same events as JSON, packed with MessagePack
+MSGPACK_SUBPROTOCOL = "desk.msgpack.v1"
+
+# keys holding a UUID (sent as 16 raw bytes) or a list of them
+_UUID_KEYS = frozenset(("id", "sticker_id", "desk_id"))
+_UUID_LIST_KEYS = frozenset(("deleted", "sticker_ids", "missing"))
+# geometry objects sent as plain number arrays
+_POINT_KEYS = {"coord": ("x", "y"), "size": ("width", "height")}
+
+
+def dumps(message: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _uuid_to_bytes(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return uuid.UUID(value).bytes
+        except ValueError:
+            pass
+    return value
+
+
+def _bytes_to_uuid(value: Any) -> Any:
+    if isinstance(value, bytes) and len(value) == 16:
+        return str(uuid.UUID(bytes=value))
+    return value
+
+
+def _to_wire(value: Any, key: str | None = None) -> Any:
+    if isinstance(value, dict):
+        if key in _POINT_KEYS:
+            return [value.get(name) for name in _POINT_KEYS[key]]
+        return {k: _to_wire(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        if key in _UUID_LIST_KEYS:
+            return [_uuid_to_bytes(v) for v in value]
+        return [_to_wire(v) for v in value]
+    if key in _UUID_KEYS:
+        return _uuid_to_bytes(value)
+    return value
+
+
+def _from_wire(value: Any, key: str | None = None) -> Any:
+    if isinstance(value, dict):
+        return {k: _from_wire(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        if key in _POINT_KEYS:
+            return dict(zip(_POINT_KEYS[key], value))
+        if key in _UUID_LIST_KEYS:
+            return [_bytes_to_uuid(v) for v in value]
+        return [_from_wire(v) for v in value]
+    if key in _UUID_KEYS:
+        return _bytes_to_uuid(value)
+    return value
+
+
+def pack(message: Any) -> bytes:
+    return msgpack.packb(_to_wire(message), use_bin_type=True)
+
+
+def unpack(data: bytes) -> Any:
+    return _from_wire(msgpack.unpackb(data, raw=False))
+
+
+class Frame:
+    """Outbound message encoded at most once per protocol and shared by every recipient."""
+
+    __slots__ = ("message", "_text", "_binary")
+
+    def __init__(self, message: dict[str, Any]) -> None:
+        self.message = message
+        self._text: str | None = None
+        self._binary: bytes | None = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self.message)
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = pack(self.message)
+        return self._binary
+
+    def seal(self) -> int:
+        """Encode for every available protocol and drop the message; returns bytes held.
+
+        For frames kept around for a long time, e.g. cached snapshots.
+        """
+        size = sys.getsizeof(self.text)
+        if msgpack is not None:
+            size += sys.getsizeof(self.binary)
+        self.message = None
+        return size
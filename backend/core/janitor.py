@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from loguru import logger
+
+from core import metrics
+from core.config import settings
+from core.database import async_session_factory
+from repository.session import SessionRepository
+
+
+class SessionJanitor:
+    """Periodically deletes old sessions in small batches.
+
+    Every login and refresh adds a session row, so without this the table
+    only grows. Each batch is its own short transaction and batches are
+    spaced out, so a large backlog never holds locks or the pool for long.
+    """
+
+    def __init__(self, interval_s: float, batch: int, pause_ms: int) -> None:
+        self.interval = interval_s
+        self.batch = batch
+        self.pause = pause_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._runs = 0
+        self._errors = 0
+        self._purged = 0
+        self._last_purged = 0
+        self._last_run_ms = 0.0
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error("Session janitor run failed: {}", e)
+                self._errors += 1
+            await asyncio.sleep(self.interval)
+
+    async def run(self) -> int:
+        """One pass over the table; returns the number of rows deleted."""
+        # revoked sessions must outlive their access tokens, workers
+        # rebuild the revocation view from these rows on startup
+        retention = max(
+            timedelta(days=settings.SESSION_RETENTION_DAYS),
+            timedelta(seconds=settings.ACCESS_TOKEN_TTL),
+        )
+        inactive_before = datetime.now(timezone.utc) - retention
+        # nobody can refresh these any more
+        expired_before = date.today() - timedelta(seconds=settings.REFRESH_TOKEN_TTL)
+
+        started = time.monotonic()
+        purged = await self._purge(lambda repo: repo.delete_inactive(inactive_before, self.batch))
+        purged += await self._purge(lambda repo: repo.delete_expired(expired_before, self.batch))
+        elapsed_ms = (time.monotonic() - started) * 1000
+
+        self._runs += 1
+        self._purged += purged
+        self._last_purged = purged
+        self._last_run_ms = elapsed_ms
+        logger.info("Session janitor purged {} sessions in {:.0f} ms", purged, elapsed_ms)
+        return purged
+
+    async def _purge(self, delete_batch: Callable[[SessionRepository], Awaitable[int]]) -> int:
+        purged = 0
+        while True:
+            async with async_session_factory() as session:
+                deleted = await delete_batch(SessionRepository(session))
+            purged += deleted
+            if deleted < self.batch:
+                return purged
+            await asyncio.sleep(self.pause)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "runs": self._runs,
+            "errors": self._errors,
+            "purged": self._purged,
+            "last_purged": self._last_purged,
+            "last_run_ms": round(self._last_run_ms, 1),
+        }
+
+
+session_janitor = SessionJanitor(
+    settings.SESSION_JANITOR_INTERVAL_S,
+    settings.SESSION_JANITOR_BATCH,
+    settings.SESSION_JANITOR_PAUSE_MS,
+)
+metrics.register("session_janitor", session_janitor.stats)
@@ -0,0 +1,12 @@
+from typing import Any, Callable, Dict
+
+_providers: Dict[str, Callable[[], Any]] = {}
+
+
+def register(name: str, provider: Callable[[], Any]) -> None:
+    """Expose `provider()` result under `name` in the metrics snapshot."""
+    _providers[name] = provider
+
+
+def collect() -> dict[str, Any]:
+    return {name: provider() for name, provider in _providers.items()}
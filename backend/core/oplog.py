@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Optional
+
+from core.encoding import Frame
+
+
+class DeskOpLog:
+    """Version counter and ring buffer of the latest broadcasts of one desk.
+
+    Keeps at most `size` frames and `max_bytes` of their UTF-8 encoded text,
+    dropping the oldest first, so a run of large frames can't hold more.
+    """
+
+    def __init__(self, size: int, max_bytes: int) -> None:
+        # versions are only comparable within one epoch
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self.size = size
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # (version, frame, bytes)
+        self._ops: deque[tuple[int, Frame, int]] = deque()
+
+    def append(self, message: dict[str, Any]) -> Frame:
+        self.version += 1
+        frame = Frame({**message, "version": self.version})
+        # encoded here rather than by the first writer, it is sent anyway;
+        # counted as the bytes of the frame on the wire, not the str object
+        size = len(frame.text.encode())
+        self._ops.append((self.version, frame, size))
+        self.bytes += size
+        while self._ops and (len(self._ops) > self.size or self.bytes > self.max_bytes):
+            self.bytes -= self._ops.popleft()[2]
+        return frame
+
+    def since(self, version: int) -> Optional[list[Frame]]:
+        """Frames after `version`, or None if some of them were already dropped."""
+        if version > self.version:
+            return None
+        if version == self.version:
+            return []
+        if not self._ops or self._ops[0][0] > version + 1:
+            return None
+        return [frame for v, frame, _ in self._ops if v > version]
+
+
+class OpLogRegistry:
+    """Op logs of recently active desks, least recently used dropped first."""
+
+    def __init__(self, size: int, max_bytes: int, max_desks: int) -> None:
+        self._size = size
+        self._max_bytes = max_bytes
+        self._max_desks = max_desks
+        self._logs: OrderedDict[str, DeskOpLog] = OrderedDict()
+
+    def get(self, desk_id: str) -> DeskOpLog:
+        log = self._logs.get(desk_id)
+        if log is None:
+            log = self._logs[desk_id] = DeskOpLog(self._size, self._max_bytes)
+            while len(self._logs) > self._max_desks:
+                self._logs.popitem(last=False)
+        else:
+            self._logs.move_to_end(desk_id)
+        return log
+
+    def discard(self, desk_id: str) -> None:
+        self._logs.pop(desk_id, None)
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    @property
+    def bytes(self) -> int:
+        return sum(log.bytes for log in self._logs.values())
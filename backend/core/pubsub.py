@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Set
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.database import engine
+from core.encoding import Frame, loads
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7999
+# every worker listens here, whatever desks it has sockets on
+ALL_WORKERS_CHANNEL = "desk_all"
+# room for the "chunk:<node>:<id>:<seq>:<total>:" header of a split payload
+CHUNK_HEADER_SIZE = 128
+# split payloads still missing pieces, e.g. after a listener reconnect
+MAX_PARTIAL_PAYLOADS = 64
+
+MessageHandler = Callable[[str, dict[str, Any]], Awaitable[None]]
+
+
+class PubSubBackend:
+    """Forwards desk messages to the other workers subscribed to a desk."""
+
+    # True when every message of a desk originates in this process
+    local_only = False
+
+    def __init__(self) -> None:
+        self._handler: Optional[MessageHandler] = None
+
+    def set_handler(self, handler: MessageHandler) -> None:
+        """Set the coroutine called for messages published by other workers."""
+        self._handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def subscribe(self, desk_id: str) -> None:
+        pass
+
+    async def unsubscribe(self, desk_id: str) -> None:
+        pass
+
+    async def publish(self, desk_id: str, frame: Frame) -> None:
+        pass
+
+    async def publish_all(self, desk_id: str, frame: Frame) -> None:
+        """Like publish(), but to every other worker, not only those subscribed to the desk."""
+        pass
+
+
+class InProcessBackend(PubSubBackend):
+    """Single worker: every subscriber is local, nothing to forward."""
+
+    local_only = True
+
+
+class PostgresBackend(PubSubBackend):
+    """Fan-out between workers over Postgres LISTEN/NOTIFY.
+
+    Holds one connection of the shared asyncpg engine for the lifetime of the
+    worker and listens on channels of desks with local connections, plus
+    one channel shared by all workers.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.node_id = uuid.uuid4().hex
+        self._conn: Optional[AsyncConnection] = None
+        self._raw: Any = None
+        self._channels: Set[str] = set()
+        # message id -> pieces of a split payload received so far
+        self._partials: OrderedDict[str, list[Optional[str]]] = OrderedDict()
+        # asyncpg allows a single operation per connection at a time
+        self._lock = asyncio.Lock()
+        self._closing = False
+
+    @staticmethod
+    def _channel(desk_id: str) -> str:
+        return f"desk_{uuid.UUID(desk_id).hex}"
+
+    async def start(self) -> None:
+        self._closing = False
+        async with self._lock:
+            await self._connect()
+
+    async def stop(self) -> None:
+        self._closing = True
+        async with self._lock:
+            if self._conn is not None:
+                await self._conn.close()
+            self._conn = None
+            self._raw = None
+            self._channels.clear()
+
+    async def _connect(self) -> None:
+        self._conn = await engine.connect()
+        raw = await self._conn.get_raw_connection()
+        self._raw = raw.driver_connection
+        self._raw.add_termination_listener(self._on_terminate)
+        for channel in (ALL_WORKERS_CHANNEL, *self._channels):
+            await self._raw.add_listener(channel, self._on_notify)
+        logger.info("Pub/sub listener connected, node {}", self.node_id)
+
+    def _on_terminate(self, _connection: Any) -> None:
+        if not self._closing:
+            logger.warning("Pub/sub listener connection lost, reconnecting...")
+            asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 0.5
+        while not self._closing:
+            async with self._lock:
+                try:
+                    if self._conn is not None:
+                        await self._conn.invalidate()
+                        await self._conn.close()
+                    await self._connect()
+                    return
+                except Exception as e:
+                    logger.error("Pub/sub reconnect failed: {}", e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10)
+
+    async def subscribe(self, desk_id: str) -> None:
+        channel = self._channel(desk_id)
+        async with self._lock:
+            if channel in self._channels:
+                return
+            self._channels.add(channel)
+            if self._raw is not None:
+                await self._raw.add_listener(channel, self._on_notify)
+
+    async def unsubscribe(self, desk_id: str) -> None:
+        channel = self._channel(desk_id)
+        async with self._lock:
+            if channel not in self._channels:
+                return
+            self._channels.discard(channel)
+            if self._raw is not None:
+                await self._raw.remove_listener(channel, self._on_notify)
+
+    async def publish(self, desk_id: str, frame: Frame) -> None:
+        await self._notify(self._channel(desk_id), desk_id, frame)
+
+    async def publish_all(self, desk_id: str, frame: Frame) -> None:
+        await self._notify(ALL_WORKERS_CHANNEL, desk_id, frame)
+
+    async def _notify(self, channel: str, desk_id: str, frame: Frame) -> None:
+        # reuse the already encoded frame instead of dumping the message again
+        payload = (
+            f'{{"node":"{self.node_id}","desk_id":"{desk_id}",'
+            f'"message":{frame.text}}}'
+        )
+        if len(payload.encode()) <= NOTIFY_PAYLOAD_LIMIT:
+            async with self._lock:
+                if self._raw is None:
+                    return
+                await self._raw.execute("SELECT pg_notify($1, $2)", channel, payload)
+            return
+
+        # too large for one NOTIFY: sent as pieces in one statement, so they
+        # are delivered together and in order, and joined by the listeners
+        pieces = split_payload(payload, NOTIFY_PAYLOAD_LIMIT - CHUNK_HEADER_SIZE)
+        message_id = uuid.uuid4().hex
+        chunks = [
+            f"chunk:{self.node_id}:{message_id}:{seq}:{len(pieces)}:{piece}"
+            for seq, piece in enumerate(pieces)
+        ]
+        async with self._lock:
+            if self._raw is None:
+                return
+            await self._raw.execute(
+                "SELECT pg_notify($1, chunk) FROM unnest($2::text[]) AS chunk",
+                channel, chunks,
+            )
+
+    def _on_notify(self, _connection: Any, _pid: int, _channel: str, payload: str) -> None:
+        if payload.startswith("chunk:"):
+            payload = self._join_chunk(payload)
+            if payload is None:
+                return
+
+        try:
+            data = loads(payload)
+        except ValueError:
+            logger.warning("Malformed pub/sub payload on {}", _channel)
+            return
+
+        # our own NOTIFY comes back to us, local sockets already got it
+        if data.get("node") == self.node_id or self._handler is None:
+            return
+
+        asyncio.get_running_loop().create_task(
+            self._handler(data["desk_id"], data["message"])
+        )
+
+    def _join_chunk(self, chunk: str) -> Optional[str]:
+        """Whole payload once its last piece arrives, None until then."""
+        try:
+            _, node, message_id, seq, total, piece = chunk.split(":", 5)
+            seq, total = int(seq), int(total)
+        except ValueError:
+            logger.warning("Malformed pub/sub chunk")
+            return None
+        if node == self.node_id or not 0 <= seq < total:
+            return None
+
+        pieces = self._partials.get(message_id)
+        if pieces is None:
+            if len(self._partials) >= MAX_PARTIAL_PAYLOADS:
+                dropped, _ = self._partials.popitem(last=False)
+                logger.warning("Pub/sub payload {} is incomplete, dropped", dropped)
+            pieces = self._partials[message_id] = [None] * total
+        pieces[seq] = piece
+        if any(p is None for p in pieces):
+            return None
+        del self._partials[message_id]
+        return "".join(pieces)
+
+
+def split_payload(payload: str, limit: int) -> list[str]:
+    """Pieces of at most `limit` UTF-8 bytes, never splitting a character."""
+    data = payload.encode()
+    pieces: list[str] = []
+    start = 0
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # back off continuation bytes (0b10xxxxxx) to a character boundary
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        pieces.append(data[start:end].decode())
+        start = end
+    return pieces
+
+
+def create_backend(name: str) -> PubSubBackend:
+    if name == "postgres":
+        return PostgresBackend()
+    if name == "memory":
+        return InProcessBackend()
+    raise ValueError(f"Unknown pub/sub backend: {name}")
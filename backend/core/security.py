@@ -1,11 +1,17 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 from uuid import UUID
 
 import jwt
 from passlib.context import CryptContext
 
+from core import metrics
+from core.cache import MISSING, TTLCache
 from core.config import settings
+from service.exception import PasswordHasherBusyError
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -33,14 +39,27 @@ def create_refresh_token(session_id: UUID) -> str:
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
 
+# token -> decoded payload, each entry expires with the token itself
+token_cache = TTLCache(settings.ACCESS_TOKEN_TTL, settings.TOKEN_CACHE_SIZE)
+
+
 def verify_token(token: str, token_type: str = "access") -> Dict[str, Any] | None:
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
-        if payload.get("type") != token_type:
+    """Decoded payload of a valid token of `token_type`, or None.
+
+    Payloads are memoized until `exp`, so a token seen before skips the
+    signature check. The returned dict is shared, don't modify it.
+    """
+    payload = token_cache.get(token)
+    if payload is MISSING:
+        try:
+            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
+        except jwt.PyJWTError:
             return None
-        return payload
-    except jwt.PyJWTError:
+        exp = payload.get("exp")
+        token_cache.set(token, payload, exp - time.time() if exp is not None else None)
+    if payload.get("type") != token_type:
         return None
+    return payload
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -48,4 +67,59 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL, so `workers` hashes run in parallel. At most
+    `queue_size` more calls may wait for a thread; beyond that calls fail
+    fast with PasswordHasherBusyError instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._limit = workers + queue_size
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._in_flight >= self._limit:
+            self._rejected += 1
+            raise PasswordHasherBusyError
+        self._in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        except BaseException:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+        self._completed += 1
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "limit": self._limit,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+metrics.register("password_hasher", password_hasher.stats)
+metrics.register("token_cache", token_cache.stats)
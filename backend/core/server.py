@@ -4,16 +4,32 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api import api_router
+from core.coalescer import coalescer
 from core.config import settings
+from core.connmanager import manager
 from core.database import close_db
+from core.deskstate import desk_state
+from core.janitor import session_janitor
+from core.security import password_hasher
+from core.sessions import session_state
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await manager.start()
+    await desk_state.start()
+    await session_state.start()
+    await session_janitor.start()
     try:
         yield
     finally:
+        await session_janitor.stop()
+        await session_state.stop()
+        await coalescer.stop()
+        await desk_state.stop()
+        await manager.stop()
         await close_db()
+        password_hasher.shutdown()
 
 
 def create_app() -> FastAPI:
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from core import metrics
+from core.config import settings
+from core.database import async_session_factory
+
+
+class SessionStateView:
+    """Answers "is this session still active" for token checks without a DB query.
+
+    Only sessions deactivated within the last access token TTL are tracked:
+    older ones can't have a live access token left. Deactivations made by
+    this worker are applied right away, those of other workers arrive with
+    the periodic sync of `session.deactivated_at`.
+    """
+
+    def __init__(self, interval_s: float, token_ttl_s: float) -> None:
+        self.interval = interval_s
+        self.token_ttl = timedelta(seconds=token_ttl_s)
+        # session_id -> wall clock time after which its tokens are all expired
+        self._revoked: Dict[str, float] = {}
+        # DB time of the last successful sync
+        self._synced_to: Optional[datetime] = None
+        self._synced_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._syncs = 0
+        self._sync_errors = 0
+        self._last_sync_ms = 0.0
+
+    async def start(self) -> None:
+        # one sync up front, so sessions revoked before the restart are known
+        await self.sync()
+        self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def is_active(self, session_id: Any) -> bool:
+        expires = self._revoked.get(str(session_id))
+        return expires is None or expires < time.time()
+
+    def mark_inactive(self, session_id: Any) -> None:
+        self._revoked[str(session_id)] = time.time() + self.token_ttl.total_seconds()
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sync()
+
+    async def sync(self) -> None:
+        """Pull deactivations since the last sync and drop entries past the token TTL."""
+        from repository.session import SessionRepository  # it imports this module
+
+        started = time.monotonic()
+        try:
+            async with async_session_factory() as session:
+                repo = SessionRepository(session)
+                now = await repo.db_now()
+                if self._synced_to is None:
+                    since = now - self.token_ttl
+                else:
+                    # overlap a bit, a deactivation may commit after its timestamp
+                    since = self._synced_to - timedelta(seconds=self.interval)
+                rows = await repo.get_deactivated_since(since)
+        except Exception as e:
+            logger.error("Session state sync failed: {}", e)
+            self._sync_errors += 1
+            return
+
+        for session_id, deactivated_at in rows:
+            self._revoked[str(session_id)] = (deactivated_at + self.token_ttl).timestamp()
+        wall = time.time()
+        for session_id in [s for s, expires in self._revoked.items() if expires < wall]:
+            del self._revoked[session_id]
+
+        self._synced_to = now
+        self._synced_at = time.monotonic()
+        self._syncs += 1
+        self._last_sync_ms = (self._synced_at - started) * 1000
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "revoked": len(self._revoked),
+            "syncs": self._syncs,
+            "sync_errors": self._sync_errors,
+            "last_sync_ms": round(self._last_sync_ms, 1),
+            "sync_age_s": (
+                round(time.monotonic() - self._synced_at, 1) if self._synced_at is not None else None
+            ),
+        }
+
+
+session_state = SessionStateView(settings.SESSION_SYNC_INTERVAL_S, settings.ACCESS_TOKEN_TTL)
+metrics.register("session_state", session_state.stats)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set
+
+from core.encoding import Frame
+
+
+class SnapshotCache:
+    """Encoded desk:init frames of recently opened desks, least recently used dropped first.
+
+    Each entry is tagged (e.g. with the op log epoch and version it was
+    loaded at) and served only to callers asking for the same tag.
+    Concurrent misses of a desk share one load. A desk may have a frame per
+    variant (e.g. full or light stickers), invalidated together. Memory is
+    bounded by the size of the encoded frames, not by the number of desks.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        # (desk_id, variant) -> (tag, frame, bytes)
+        self._entries: OrderedDict[tuple[str, Hashable], tuple[Hashable, Frame, int]] = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        # (desk_id, variant) -> (tag, frame being loaded)
+        self._loading: Dict[tuple[str, Hashable], tuple[Hashable, asyncio.Future[Frame]]] = {}
+        self._variants: Set[Hashable] = set()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_load(
+        self,
+        desk_id: str,
+        tag: Hashable,
+        load: Callable[[], Awaitable[Frame]],
+        variant: Hashable = None,
+    ) -> Frame:
+        key = (desk_id, variant)
+        self._variants.add(variant)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == tag:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+        loading = self._loading.get(key)
+        if loading is not None and loading[0] == tag:
+            self._coalesced += 1
+            return await asyncio.shield(loading[1])
+
+        self._misses += 1
+        loading = self._loading[key] = (tag, asyncio.get_running_loop().create_future())
+        future = loading[1]
+        try:
+            frame = await load()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # retrieved here in case nobody else was waiting
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        finally:
+            # gone if the desk changed meanwhile, the frame may be stale then
+            current = self._loading.get(key) is loading
+            if current:
+                del self._loading[key]
+
+        if current:
+            self._store(key, tag, frame)
+        future.set_result(frame)
+        return frame
+
+    def invalidate(self, desk_id: str) -> None:
+        """Drop the desk's frames; loads already running won't be stored."""
+        for variant in self._variants:
+            self._loading.pop((desk_id, variant), None)
+            self._discard((desk_id, variant))
+
+    def _discard(self, key: tuple[str, Hashable]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _store(self, key: tuple[str, Hashable], tag: Hashable, frame: Frame) -> None:
+        self._discard(key)
+        size = frame.seal()
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (tag, frame, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self._evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses + self._coalesced
+        return {
+            "frames": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "hit_rate": round((self._hits + self._coalesced) / lookups, 3) if lookups else 0.0,
+            "evictions": self._evictions,
+        }
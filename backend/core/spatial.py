@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+from core.textops import apply_ops, parse_ops
+
+# (x0, y0, x1, y1)
+Rect = tuple[float, float, float, float]
+
+# stickers spanning more cells than this are kept outside the grid
+MAX_CELLS_PER_ITEM = 256
+
+
+def sticker_rect(sticker: dict[str, Any]) -> Optional[Rect]:
+    try:
+        x = float(sticker["coord"]["x"])
+        y = float(sticker["coord"]["y"])
+        width = float(sticker["size"]["width"])
+        height = float(sticker["size"]["height"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return x, y, x + width, y + height
+
+
+def intersects(a: Rect, b: Rect) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class GridIndex:
+    """Uniform grid over rectangles; a rect is registered in every cell it touches."""
+
+    def __init__(self, cell_size: float) -> None:
+        self.cell_size = cell_size
+        self._rects: Dict[str, Rect] = {}
+        self._cells: Dict[tuple[int, int], Set[str]] = defaultdict(set)
+        self._oversized: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    def _cell_span(self, rect: Rect) -> tuple[int, int, int, int]:
+        size = self.cell_size
+        return (
+            math.floor(rect[0] / size),
+            math.floor(rect[1] / size),
+            math.floor(rect[2] / size),
+            math.floor(rect[3] / size),
+        )
+
+    def _cells_of(self, span: tuple[int, int, int, int]) -> Optional[Iterable[tuple[int, int]]]:
+        cx0, cy0, cx1, cy1 = span
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > MAX_CELLS_PER_ITEM:
+            return None
+        return ((cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1))
+
+    def rect(self, key: str) -> Optional[Rect]:
+        return self._rects.get(key)
+
+    def upsert(self, key: str, rect: Rect) -> None:
+        old = self._rects.get(key)
+        if old is not None:
+            if self._cell_span(old) == self._cell_span(rect):
+                # moved within the same cells, nothing to re-register
+                self._rects[key] = rect
+                return
+            self.remove(key)
+
+        self._rects[key] = rect
+        cells = self._cells_of(self._cell_span(rect))
+        if cells is None:
+            self._oversized.add(key)
+            return
+        for cell in cells:
+            self._cells[cell].add(key)
+
+    def remove(self, key: str) -> None:
+        rect = self._rects.pop(key, None)
+        if rect is None:
+            return
+        cells = self._cells_of(self._cell_span(rect))
+        if cells is None:
+            self._oversized.discard(key)
+            return
+        for cell in cells:
+            keys = self._cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._cells[cell]
+
+    def query(self, rect: Rect) -> Set[str]:
+        cx0, cy0, cx1, cy1 = self._cell_span(rect)
+        candidates: Set[str] = set(self._oversized)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # viewport larger than the populated area: walk the cells instead
+            for (cx, cy), keys in self._cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    candidates |= keys
+        else:
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    keys = self._cells.get((cx, cy))
+                    if keys:
+                        candidates |= keys
+        return {key for key in candidates if intersects(self._rects[key], rect)}
+
+
+class SpatialView:
+    """Mirror of a desk's stickers with a spatial index, fed by its broadcasts.
+
+    Changes are applied by sticker version, so broadcasts already contained
+    in the loaded stickers are skipped. Raises ValueError when text ops
+    don't follow the mirrored version; the mirror is out of sync then.
+    """
+
+    def __init__(self, cell_size: float) -> None:
+        self.stickers: Dict[str, dict[str, Any]] = {}
+        self.index = GridIndex(cell_size)
+        self.loaded: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        # broadcasts received while the initial load was running
+        self._pending: list[dict[str, Any]] = []
+
+    def load(self, stickers: Iterable[dict[str, Any]]) -> None:
+        for sticker in stickers:
+            self._put(dict(sticker))
+        for message in self._pending:
+            self._apply(message)
+        self._pending.clear()
+        self.loaded.set_result(None)
+
+    def apply(self, message: dict[str, Any]) -> None:
+        if not self.loaded.done():
+            self._pending.append(message)
+        else:
+            self._apply(message)
+
+    def visible(self, sticker_id: str, viewport: Rect) -> bool:
+        rect = self.index.rect(sticker_id)
+        return rect is not None and intersects(rect, viewport)
+
+    def query(self, viewport: Rect) -> Set[str]:
+        return self.index.query(viewport)
+
+    def _put(self, sticker: dict[str, Any]) -> None:
+        self.stickers[sticker["id"]] = sticker
+        rect = sticker_rect(sticker)
+        if rect is None:
+            self.index.remove(sticker["id"])
+        else:
+            self.index.upsert(sticker["id"], rect)
+
+    def _create(self, sticker: dict[str, Any]) -> None:
+        # already loaded if created while the view was loading
+        if sticker["id"] not in self.stickers:
+            self._put(dict(sticker))
+
+    def _update(self, data: dict[str, Any]) -> None:
+        sticker = self.stickers.get(data["sticker_id"])
+        if sticker is None:
+            return
+        version = data.get("version")
+        if version is not None and version <= sticker.get("version", 0):
+            return
+        changed = {k: v for k, v in data.items() if k not in ("sticker_id", "text_ops")}
+        if "text_ops" in data:
+            # ops are made on the version right before theirs
+            if version is not None and version - 1 != sticker.get("version"):
+                raise ValueError(
+                    f"text ops of version {version} don't follow mirrored version "
+                    f"{sticker.get('version')}"
+                )
+            changed["text"] = apply_ops(sticker.get("text") or "", parse_ops(data["text_ops"]))
+        self._put({**sticker, **changed})
+
+    def _delete(self, sticker_id: str) -> None:
+        self.stickers.pop(sticker_id, None)
+        self.index.remove(sticker_id)
+
+    def _apply(self, message: dict[str, Any]) -> None:
+        event = message.get("event")
+        data = message.get("data") or {}
+        if event == "sticker:created":
+            self._create(data["sticker"])
+        elif event == "sticker:updated":
+            self._update(data)
+        elif event == "sticker:deleted":
+            self._delete(data["sticker_id"])
+        elif event == "batch:applied":
+            for item in data.get("created", ()):
+                self._create(item["sticker"])
+            for item in data.get("updated", ()):
+                self._update(item)
+            for sticker_id in data.get("deleted", ()):
+                self._delete(sticker_id)
+
+
+def _enter(stickers: list[dict[str, Any]]) -> dict[str, Any]:
+    return {"event": "sticker:enter", "data": {"stickers": stickers}}
+
+
+def _leave(sticker_ids: list[str]) -> dict[str, Any]:
+    return {"event": "sticker:leave", "data": {"sticker_ids": sticker_ids}}
+
+
+def viewport_diff(
+    view: SpatialView, viewport: Optional[Rect], visible: Set[str]
+) -> tuple[Set[str], list[dict[str, Any]]]:
+    """Stickers visible in a new viewport and the enter/leave messages to get there.
+
+    A viewport of None stands for the whole desk.
+    """
+    now = view.query(viewport) if viewport is not None else set(view.stickers)
+    messages = []
+    entered = now - visible
+    left = visible - now
+    if entered:
+        messages.append(_enter([view.stickers[i] for i in entered]))
+    if left:
+        messages.append(_leave(list(left)))
+    return now, messages
+
+
+def scope_message(
+    message: dict[str, Any],
+    view: SpatialView,
+    viewport: Rect,
+    visible: Set[str],
+    origin: bool = False,
+) -> Optional[list[dict[str, Any]]]:
+    """Messages a viewport-scoped client should get for a desk broadcast.
+
+    Returns None when the broadcast should be sent as is. Updates `visible`
+    in place. `view` must already have the broadcast applied. `origin` marks
+    the client that made the change: it gets its creates wherever they are,
+    as they ack its temp_ids.
+    """
+    event = message.get("event")
+    data = message.get("data") or {}
+
+    if event == "sticker:created":
+        sticker_id = data["sticker"]["id"]
+        if origin or view.visible(sticker_id, viewport):
+            visible.add(sticker_id)
+            return None
+        return []
+
+    if event == "sticker:updated":
+        sticker_id = data["sticker_id"]
+        was, now = sticker_id in visible, view.visible(sticker_id, viewport)
+        if was and now:
+            return None
+        if was:
+            visible.discard(sticker_id)
+            return [_leave([sticker_id])]
+        if now:
+            visible.add(sticker_id)
+            return [_enter([view.stickers[sticker_id]])]
+        return []
+
+    if event == "sticker:deleted":
+        if data["sticker_id"] in visible:
+            visible.discard(data["sticker_id"])
+            return None
+        return []
+
+    if event == "batch:applied":
+        created, updated, deleted, entered, left = [], [], [], [], []
+        for item in data.get("created", ()):
+            sticker_id = item["sticker"]["id"]
+            if origin or view.visible(sticker_id, viewport):
+                visible.add(sticker_id)
+                created.append(item)
+        for item in data.get("updated", ()):
+            sticker_id = item["sticker_id"]
+            was, now = sticker_id in visible, view.visible(sticker_id, viewport)
+            if was and now:
+                updated.append(item)
+            elif was:
+                visible.discard(sticker_id)
+                left.append(sticker_id)
+            elif now:
+                visible.add(sticker_id)
+                entered.append(view.stickers[sticker_id])
+        for sticker_id in data.get("deleted", ()):
+            if sticker_id in visible:
+                visible.discard(sticker_id)
+                deleted.append(sticker_id)
+
+        if (
+            len(created) == len(data.get("created", ()))
+            and len(updated) == len(data.get("updated", ()))
+            and len(deleted) == len(data.get("deleted", ()))
+            and not entered and not left
+        ):
+            return None
+
+        messages = []
+        # the sender needs the ack with batch_id even if nothing is visible
+        if created or updated or deleted or data.get("batch_id") is not None:
+            messages.append({
+                **message,
+                "data": {**data, "created": created, "updated": updated, "deleted": deleted},
+            })
+        if entered:
+            messages.append(_enter(entered))
+        if left:
+            messages.append(_leave(left))
+        return messages
+
+    return None
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core import metrics
+from core.config import settings
+
+# ("ins", pos, text) or ("del", pos, length). A list of ops is applied in
+# order, positions count Unicode code points of the text left by the ops
+# before. On the wire: {"pos": int, "insert": str} or {"pos": int, "delete": int}.
+TextOp = Tuple[str, int, Any]
+
+
+def parse_ops(raw: Any) -> List[TextOp]:
+    """Wire ops -> ops; raises ValueError."""
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("text_ops must be a non-empty list")
+    ops: List[TextOp] = []
+    for item in raw:
+        if not isinstance(item, dict):
+            raise ValueError("text op must be an object")
+        pos = item.get("pos")
+        if not isinstance(pos, int) or isinstance(pos, bool) or pos < 0:
+            raise ValueError("text op pos must be a non-negative integer")
+        if "insert" in item and "delete" not in item:
+            if not isinstance(item["insert"], str):
+                raise ValueError("text op insert must be a string")
+            ops.append(("ins", pos, item["insert"]))
+        elif "delete" in item and "insert" not in item:
+            length = item["delete"]
+            if not isinstance(length, int) or isinstance(length, bool) or length < 0:
+                raise ValueError("text op delete must be a non-negative integer")
+            ops.append(("del", pos, length))
+        else:
+            raise ValueError("text op needs either insert or delete")
+    return ops
+
+
+def dump_ops(ops: Sequence[TextOp]) -> List[dict]:
+    return [
+        {"pos": pos, "insert": arg} if kind == "ins" else {"pos": pos, "delete": arg}
+        for kind, pos, arg in ops
+    ]
+
+
+def apply_ops(text: str, ops: Sequence[TextOp]) -> str:
+    """Text after `ops`; raises ValueError if an op falls outside the text."""
+    for kind, pos, arg in ops:
+        if kind == "ins":
+            if pos > len(text):
+                raise ValueError("text op pos is past the end of the text")
+            text = text[:pos] + arg + text[pos:]
+        else:
+            if pos + arg > len(text):
+                raise ValueError("text op deletes past the end of the text")
+            text = text[:pos] + text[pos + arg:]
+    return text
+
+
+def _shift_delete(pos: int, length: int, other_pos: int, other_length: int) -> List[TextOp]:
+    """Delete of [pos, pos+length) once [other_pos, other_pos+other_length) is gone."""
+    end, other_end = pos + length, other_pos + other_length
+    overlap = max(0, min(end, other_end) - max(pos, other_pos))
+    if pos >= other_end:
+        pos -= other_length
+    elif pos > other_pos:
+        pos = other_pos
+    length -= overlap
+    return [("del", pos, length)] if length else []
+
+
+def _transform_one(a: TextOp, b: TextOp) -> Tuple[List[TextOp], List[TextOp]]:
+    """(a after b, b after a) for two ops made on the same text; b wins ties."""
+    if a[0] == "ins" and b[0] == "ins":
+        if a[1] < b[1]:
+            return [a], [("ins", b[1] + len(a[2]), b[2])]
+        return [("ins", a[1] + len(b[2]), a[2])], [b]
+
+    if a[0] == "ins":
+        _, pos, text = a
+        _, start, length = b
+        if pos <= start:
+            return [a], [("del", start + len(text), length)]
+        if pos >= start + length:
+            return [("ins", pos - length, text)], [b]
+        # typed inside the deleted range: keep the text, delete around it
+        head = pos - start
+        return [("ins", start, text)], [
+            ("del", start, head),
+            ("del", start + len(text), length - head),
+        ]
+
+    if b[0] == "ins":
+        b_after, a_after = _transform_one(b, a)
+        return a_after, b_after
+
+    return _shift_delete(a[1], a[2], b[1], b[2]), _shift_delete(b[1], b[2], a[1], a[2])
+
+
+def _transform(
+    ops: List[TextOp], against: List[TextOp]
+) -> Tuple[List[TextOp], List[TextOp]]:
+    if not ops or not against:
+        return ops, against
+    if len(ops) == 1 and len(against) == 1:
+        return _transform_one(ops[0], against[0])
+    if len(ops) > 1:
+        first, against = _transform(ops[:1], against)
+        rest, against = _transform(ops[1:], against)
+        return first + rest, against
+    ops, head = _transform(ops, against[:1])
+    ops, tail = _transform(ops, against[1:])
+    return ops, head + tail
+
+
+def transform(ops: List[TextOp], against: List[TextOp]) -> List[TextOp]:
+    """`ops` rewritten to apply after `against`, both made on the same text."""
+    return _transform(ops, against)[0]
+
+
+class TextHistory:
+    """Text changes behind recent sticker versions, for transforming stale edits.
+
+    For every version of a sticker it keeps the ops that produced it: an
+    empty list when the text didn't change, None when the text was
+    replaced as a whole and later edits can't be transformed across it.
+    """
+
+    def __init__(self, versions: int, max_stickers: int) -> None:
+        self._versions = versions
+        self._max_stickers = max_stickers
+        self._stickers: OrderedDict[str, Dict[int, Optional[List[TextOp]]]] = OrderedDict()
+
+    def record(self, sticker_id: str, version: int, ops: Optional[List[TextOp]]) -> None:
+        history = self._stickers.get(sticker_id)
+        if history is None:
+            history = self._stickers[sticker_id] = {}
+            while len(self._stickers) > self._max_stickers:
+                self._stickers.popitem(last=False)
+        else:
+            self._stickers.move_to_end(sticker_id)
+        history[version] = ops
+        for old in [v for v in history if v <= version - self._versions]:
+            del history[old]
+
+    def since(self, sticker_id: str, version: int, current: int) -> Optional[List[TextOp]]:
+        """Ops that took the text from `version` to `current`, or None if unknown."""
+        history = self._stickers.get(sticker_id, {})
+        ops: List[TextOp] = []
+        for v in range(version + 1, current + 1):
+            step = history.get(v)
+            if step is None:
+                return None
+            ops.extend(step)
+        return ops
+
+    def discard(self, sticker_id: str) -> None:
+        self._stickers.pop(sticker_id, None)
+
+    def __len__(self) -> int:
+        return len(self._stickers)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "stickers": len(self._stickers),
+            "versions": sum(len(h) for h in self._stickers.values()),
+        }
+
+
+text_history = TextHistory(settings.TEXT_HISTORY_VERSIONS, settings.TEXT_HISTORY_STICKERS)
+metrics.register("text_history", text_history.stats)
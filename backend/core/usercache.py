@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import uuid
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from core import metrics
+from core.cache import TTLCache
+from core.config import settings
+
+
+class CachedUser(NamedTuple):
+    """What request handlers need of the authenticated user; immutable, so safe to share."""
+
+    id: uuid.UUID
+    name: str
+    email: str
+
+
+# user_id -> CachedUser, or None for ids that don't exist
+user_cache = TTLCache(settings.USER_CACHE_TTL_S, settings.USER_CACHE_SIZE)
+
+
+async def get_cached_user(
+    user_id: uuid.UUID, load: Callable[[uuid.UUID], Awaitable[Any]]
+) -> Optional[CachedUser]:
+    """User projection, loaded with `load(user_id)` on a miss (one load per id at a time)."""
+    async def load_projection() -> Optional[CachedUser]:
+        user = await load(user_id)
+        if user is None:
+            return None
+        return CachedUser(id=user.id, name=user.name, email=user.email)
+
+    return await user_cache.get_or_load(user_id, load_projection)
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    user_cache.invalidate(user_id)
+    # renames and deletions should not linger in search results
+    search_cache.clear()
+
+
+# (normalized query, limit) -> tuple of CachedUser; a short TTL absorbs
+# autocomplete bursts, new users show up once it expires
+search_cache = TTLCache(settings.USER_SEARCH_CACHE_TTL_S, settings.USER_SEARCH_CACHE_SIZE)
+
+
+async def search_cached_users(
+    query: str, limit: int, search: Callable[[str, int], Awaitable[Any]]
+) -> tuple[CachedUser, ...]:
+    """Search results, running `search(query, limit)` on a miss."""
+    query = query.strip().lower()
+
+    async def load_projection() -> tuple[CachedUser, ...]:
+        users = await search(query, limit)
+        return tuple(CachedUser(id=u.id, name=u.name, email=u.email) for u in users)
+
+    return await search_cache.get_or_load((query, limit), load_projection)
+
+
+metrics.register("user_cache", user_cache.stats)
+metrics.register("user_search_cache", search_cache.stats)
@@ -0,0 +1,29 @@
+"""desk_detail version
+
+Revision ID: 5b9e2d7a41c3
+Revises: 28f1c80c0ad3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e2d7a41c3'
+down_revision: Union[str, None] = '28f1c80c0ad3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'desk_detail',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('desk_detail', 'version')
@@ -0,0 +1,59 @@
+"""desk_detail geometry columns
+
+Revision ID: 8c4f1e2b9d07
+Revises: 5b9e2d7a41c3
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4f1e2b9d07'
+down_revision: Union[str, None] = '5b9e2d7a41c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GEOMETRY = ('x', 'y', 'width', 'height')
+
+
+def upgrade() -> None:
+    for name in GEOMETRY:
+        op.add_column('desk_detail', sa.Column(name, sa.Float(), nullable=True))
+
+    # coord/size hold JSON text like '{"x": 100, "y": 200}'
+    op.execute(
+        """
+        UPDATE desk_detail SET
+            x = (coord::json ->> 'x')::double precision,
+            y = (coord::json ->> 'y')::double precision,
+            width = (size::json ->> 'width')::double precision,
+            height = (size::json ->> 'height')::double precision
+        """
+    )
+
+    for name in GEOMETRY:
+        op.alter_column('desk_detail', name, nullable=False)
+    op.drop_column('desk_detail', 'coord')
+    op.drop_column('desk_detail', 'size')
+
+
+def downgrade() -> None:
+    op.add_column('desk_detail', sa.Column('coord', sa.String(), nullable=True))
+    op.add_column('desk_detail', sa.Column('size', sa.String(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE desk_detail SET
+            coord = json_build_object('x', x, 'y', y)::text,
+            size = json_build_object('width', width, 'height', height)::text
+        """
+    )
+
+    op.alter_column('desk_detail', 'coord', nullable=False)
+    op.alter_column('desk_detail', 'size', nullable=False)
+    for name in GEOMETRY:
+        op.drop_column('desk_detail', name)
@@ -0,0 +1,31 @@
+"""session deactivated_at
+
+Revision ID: a4f08d3c6e15
+Revises: e7d2a9c4f618
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f08d3c6e15'
+down_revision: Union[str, None] = 'e7d2a9c4f618'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('session', sa.Column('deactivated_at', sa.DateTime(timezone=True), nullable=True))
+    # sessions closed before this have no timestamp; treat them as closed now,
+    # so tokens issued for them are rejected until they expire
+    op.execute("UPDATE session SET deactivated_at = now() WHERE NOT is_active")
+    op.create_index('ix_session_deactivated_at', 'session', ['deactivated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_session_deactivated_at', table_name='session')
+    op.drop_column('session', 'deactivated_at')
@@ -0,0 +1,28 @@
+"""desk detail keyset index
+
+Revision ID: b6d4e8a1c372
+Revises: f3b8c27d4e91
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d4e8a1c372'
+down_revision: Union[str, None] = 'f3b8c27d4e91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # serves init=stream pages by id and plain desk lookups
+    op.create_index('ix_desk_detail_desk_id_id', 'desk_detail', ['desk_id', 'id'])
+    op.drop_index('ix_desk_detail_desk_id', table_name='desk_detail')
+
+
+def downgrade() -> None:
+    op.create_index('ix_desk_detail_desk_id', 'desk_detail', ['desk_id'])
+    op.drop_index('ix_desk_detail_desk_id_id', table_name='desk_detail')
@@ -0,0 +1,26 @@
+"""session last_active index
+
+Revision ID: b82e6c1d9f47
+Revises: a4f08d3c6e15
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b82e6c1d9f47'
+down_revision: Union[str, None] = 'a4f08d3c6e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # lets the session janitor find expired sessions without a full scan
+    op.create_index('ix_session_last_active', 'session', ['last_active'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_session_last_active', table_name='session')
@@ -0,0 +1,61 @@
+"""lookup indexes
+
+Revision ID: c31a7f5e9b24
+Revises: 8c4f1e2b9d07
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c31a7f5e9b24'
+down_revision: Union[str, None] = '8c4f1e2b9d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keep one share per (desk, user) before making it unique
+    op.execute(
+        """
+        DELETE FROM desk_share a
+        USING desk_share b
+        WHERE a.desk_id = b.desk_id AND a.user_id = b.user_id AND a.id > b.id
+        """
+    )
+
+    # duplicate users own desks, shares and sessions, so they aren't merged
+    # here; registration compares emails as stored, so does the constraint
+    if not context.is_offline_mode():
+        duplicates = op.get_bind().execute(sa.text(
+            'SELECT email, count(*) FROM "user" GROUP BY email HAVING count(*) > 1 '
+            'ORDER BY email LIMIT 10'
+        )).all()
+        if duplicates:
+            raise RuntimeError(
+                "Cannot create uq_user_email: some emails belong to several users "
+                f"({', '.join(f'{email} x{count}' for email, count in duplicates)}). "
+                "Merge or delete the duplicate users, then run the migration again."
+            )
+
+    op.create_unique_constraint('uq_user_email', 'user', ['email'])
+    op.create_unique_constraint(
+        'uq_desk_share_desk_id_user_id', 'desk_share', ['desk_id', 'user_id']
+    )
+    op.create_index('ix_desk_share_user_id', 'desk_share', ['user_id'])
+    op.create_index('ix_desk_detail_desk_id', 'desk_detail', ['desk_id'])
+    op.create_index('ix_desks_owner_id', 'desks', ['owner_id'])
+    op.create_index('ix_session_user_id', 'session', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_session_user_id', table_name='session')
+    op.drop_index('ix_desks_owner_id', table_name='desks')
+    op.drop_index('ix_desk_detail_desk_id', table_name='desk_detail')
+    op.drop_index('ix_desk_share_user_id', table_name='desk_share')
+    op.drop_constraint('uq_desk_share_desk_id_user_id', 'desk_share', type_='unique')
+    op.drop_constraint('uq_user_email', 'user', type_='unique')
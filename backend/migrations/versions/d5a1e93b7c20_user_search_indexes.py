@@ -0,0 +1,52 @@
+"""user search indexes
+
+Revision ID: d5a1e93b7c20
+Revises: b82e6c1d9f47
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a1e93b7c20'
+down_revision: Union[str, None] = 'b82e6c1d9f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # built concurrently, so a large user table stays writable meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_email_lower_prefix', 'user',
+            [sa.text('lower(email) text_pattern_ops')],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_user_name_lower_prefix', 'user',
+            [sa.text('lower(name) text_pattern_ops')],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_user_email_trgm', 'user', ['email'],
+            postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_user_name_trgm', 'user', ['name'],
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    # pg_trgm is left installed, other objects may use it
+    op.drop_index('ix_user_name_trgm', table_name='user')
+    op.drop_index('ix_user_email_trgm', table_name='user')
+    op.drop_index('ix_user_name_lower_prefix', table_name='user')
+    op.drop_index('ix_user_email_lower_prefix', table_name='user')
@@ -0,0 +1,30 @@
+"""desks keyset index
+
+Revision ID: e7d2a9c4f618
+Revises: c31a7f5e9b24
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d2a9c4f618'
+down_revision: Union[str, None] = 'c31a7f5e9b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # serves GET /desks pages by (updated_at, id) and plain owner lookups
+    op.create_index(
+        'ix_desks_owner_id_updated_at_id', 'desks', ['owner_id', 'updated_at', 'id']
+    )
+    op.drop_index('ix_desks_owner_id', table_name='desks')
+
+
+def downgrade() -> None:
+    op.create_index('ix_desks_owner_id', 'desks', ['owner_id'])
+    op.drop_index('ix_desks_owner_id_updated_at_id', table_name='desks')
@@ -0,0 +1,32 @@
+"""desk share keyset index
+
+Revision ID: f3b8c27d4e91
+Revises: d5a1e93b7c20
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8c27d4e91'
+down_revision: Union[str, None] = 'd5a1e93b7c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # serves GET /desks/shared pages by (created_at, desk_id) and plain user lookups
+    op.create_index(
+        'ix_desk_share_user_id_created_at_id',
+        'desk_share',
+        ['user_id', 'created_at', 'desk_id'],
+    )
+    op.drop_index('ix_desk_share_user_id', table_name='desk_share')
+
+
+def downgrade() -> None:
+    op.create_index('ix_desk_share_user_id', 'desk_share', ['user_id'])
+    op.drop_index('ix_desk_share_user_id_created_at_id', table_name='desk_share')
@@ -4,7 +4,7 @@ import uuid
 from datetime import date
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Date, ForeignKey, String
+from sqlalchemy import Date, Float, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -34,6 +34,9 @@ class Desk(Base):
     created_at: Mapped[date] = mapped_column(Date, default=date.today, nullable=False)
     updated_at: Mapped[date] = mapped_column(Date, default=date.today, nullable=False)
 
+    # lookups by owner and keyset pages of GET /desks
+    __table_args__ = (Index("ix_desks_owner_id_updated_at_id", "owner_id", "updated_at", "id"),)
+
     owner: Mapped["User"] = relationship(back_populates="desks_owned")
     details: Mapped[list["DeskDetail"]] = relationship(back_populates="desk")
     shares: Mapped[list["DeskShare"]] = relationship(back_populates="desk")
@@ -57,10 +60,19 @@ class DeskDetail(Base):
         nullable=False,
     )
 
-    coord: Mapped[str] = mapped_column(String, nullable=False)
-    size: Mapped[str] = mapped_column(String, nullable=False)
+    x: Mapped[float] = mapped_column(Float, nullable=False)
+    y: Mapped[float] = mapped_column(Float, nullable=False)
+    width: Mapped[float] = mapped_column(Float, nullable=False)
+    height: Mapped[float] = mapped_column(Float, nullable=False)
     color: Mapped[str] = mapped_column(String, nullable=False)
     text: Mapped[str] = mapped_column(String, nullable=False)
+    # bumped on every update, for optimistic concurrency
+    version: Mapped[int] = mapped_column(
+        Integer, default=1, server_default="1", nullable=False
+    )
+
+    # lookups by desk and init=stream pages by id
+    __table_args__ = (Index("ix_desk_detail_desk_id_id", "desk_id", "id"),)
 
     desk: Mapped["Desk"] = relationship(back_populates="details")
 
@@ -87,5 +99,11 @@ class DeskShare(Base):
 
     created_at: Mapped[date] = mapped_column(Date, default=date.today, nullable=False)
 
+    # lookups by user and keyset pages of GET /desks/shared
+    __table_args__ = (
+        UniqueConstraint("desk_id", "user_id", name="uq_desk_share_desk_id_user_id"),
+        Index("ix_desk_share_user_id_created_at_id", "user_id", "created_at", "desk_id"),
+    )
+
     desk: Mapped["Desk"] = relationship(back_populates="shares")
     user: Mapped["User"] = relationship(back_populates="desk_shares")
\ No newline at end of file
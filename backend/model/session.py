@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import uuid
-from datetime import date
-from typing import TYPE_CHECKING
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import Boolean, Date, ForeignKey
+from sqlalchemy import Boolean, Date, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -23,14 +23,21 @@ class Session(Base):
         default=uuid.uuid4,
     )
     created_at: Mapped[date] = mapped_column(Date, default=date.today, nullable=False)
-    last_active: Mapped[date] = mapped_column(Date, default=date.today, nullable=False)
+    last_active: Mapped[date] = mapped_column(
+        Date, default=date.today, nullable=False, index=True
+    )
 
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    # set on logout/refresh, lets workers pick up revocations incrementally
+    deactivated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True, index=True
+    )
 
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("user.id"),
         nullable=False,
+        index=True,
     )
 
     user: Mapped["User"] = relationship(back_populates="sessions")
\ No newline at end of file
@@ -4,7 +4,7 @@ import uuid
 from datetime import date
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Date, String
+from sqlalchemy import Date, Index, String, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -31,6 +31,21 @@ class User(Base):
 
     name: Mapped[str] = mapped_column(String, nullable=False)
     email: Mapped[str] = mapped_column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("email", name="uq_user_email"),
+        # /users/search: prefix matches by btree, substring matches by trigram
+        Index("ix_user_email_lower_prefix", text("lower(email) text_pattern_ops")),
+        Index("ix_user_name_lower_prefix", text("lower(name) text_pattern_ops")),
+        Index(
+            "ix_user_email_trgm", "email",
+            postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_user_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
     pass_hash: Mapped[str] = mapped_column(String, nullable=False)
 
     sessions: Mapped[list["Session"]] = relationship(back_populates="user")
@@ -1,8 +1,8 @@
 from uuid import UUID
 from datetime import date
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, exists
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import select, update, delete, exists, func, true, tuple_
+from sqlalchemy.orm import aliased
 from model.desk import Desk, DeskDetail, DeskShare
 
 
@@ -64,24 +64,39 @@ class DeskRepository:
         await self.session.commit()
         return (result.rowcount or 0) > 0
     
-    async def count_owned_by_user(self, user_id: UUID) -> int:
-        stmt = select(func.count()).select_from(
-            select(Desk).where(Desk.owner_id == user_id).subquery()
-        )
-        result = await self.session.execute(stmt)
-        return result.scalar_one()
-    
-    async def get_owned_by_user_paginated(
+    async def get_owned_page(
         self,
         user_id: UUID,
         limit: int,
-        offset: int,
-    ) -> list[Desk]:
-        stmt = (
-            select(Desk)
+        after: tuple[date, UUID] | None = None,
+    ) -> tuple[list[Desk], int]:
+        """Desks of an owner, newest first, after the (updated_at, id) keyset.
+
+        The total comes from the same statement; the page is LEFT JOINed to
+        the count so an empty page still carries it.
+        """
+        conditions = [Desk.owner_id == user_id]
+        if after is not None:
+            conditions.append(tuple_(Desk.updated_at, Desk.id) < after)
+
+        total = (
+            select(func.count().label("total"))
             .where(Desk.owner_id == user_id)
-            .offset(offset)
+            .subquery()
+        )
+        page = (
+            select(Desk)
+            .where(*conditions)
+            .order_by(Desk.updated_at.desc(), Desk.id.desc())
             .limit(limit)
+            .subquery()
         )
-        result = await self.session.execute(stmt)
-        return list(result.scalars())
+        desk = aliased(Desk, page)
+        result = await self.session.execute(
+            select(total.c.total, desk)
+            .select_from(total)
+            .outerjoin(page, true())
+            .order_by(page.c.updated_at.desc(), page.c.id.desc())
+        )
+        rows = result.all()
+        return [row[1] for row in rows if row[1] is not None], rows[0][0]
@@ -1,8 +1,21 @@
+from typing import Sequence
 from uuid import UUID
-from sqlalchemy import select, delete
+from datetime import date
+from sqlalchemy import Float, Integer, Row, String, cast, column, delete, func, insert, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from model.desk import DeskDetail
+from service.exception import StickersNotFoundError
+
+UPDATABLE_FIELDS = {
+    "x": Float,
+    "y": Float,
+    "width": Float,
+    "height": Float,
+    "color": String,
+    "text": String,
+}
 
 
 class DeskDetailRepository:
@@ -15,29 +28,175 @@ class DeskDetailRepository:
         )
         return list(result.scalars().all())
 
+    async def get_page_by_desk_id(
+        self, desk_id: UUID, limit: int, after: UUID | None = None
+    ) -> Sequence[Row]:
+        """Up to `limit` stickers of a desk with ids above `after`, in id order.
+
+        Plain rows, not ORM objects, read from ix_desk_detail_desk_id_id.
+        """
+        stmt = select(DeskDetail.__table__).where(DeskDetail.desk_id == desk_id)
+        if after is not None:
+            stmt = stmt.where(DeskDetail.id > after)
+        result = await self.session.execute(stmt.order_by(DeskDetail.id).limit(limit))
+        return result.all()
+
     async def get_by_id(self, sticker_id: UUID) -> DeskDetail | None:
         result = await self.session.execute(
             select(DeskDetail).where(DeskDetail.id == sticker_id)
         )
         return result.scalar_one_or_none()
 
-    async def create(self, sticker: DeskDetail) -> DeskDetail:
-        self.session.add(sticker)
+    async def get_by_ids(self, desk_id: UUID, sticker_ids: list[UUID]) -> list[DeskDetail]:
+        result = await self.session.execute(
+            select(DeskDetail).where(
+                DeskDetail.desk_id == desk_id,
+                DeskDetail.id.in_(sticker_ids),
+            )
+        )
+        return list(result.scalars().all())
+
+    async def get_texts(self, desk_id: UUID, sticker_ids: list[UUID]) -> Sequence[Row]:
+        """(id, text, version) of the given stickers of a desk."""
+        result = await self.session.execute(
+            select(DeskDetail.id, DeskDetail.text, DeskDetail.version).where(
+                DeskDetail.desk_id == desk_id,
+                DeskDetail.id.in_(sticker_ids),
+            )
+        )
+        return result.all()
+
+    async def create(self, row: dict) -> DeskDetail:
+        """INSERT ... RETURNING, one round trip."""
+        sticker = await self.session.scalar(
+            insert(DeskDetail).values(row).returning(DeskDetail)
+        )
         await self.session.commit()
-        await self.session.refresh(sticker)
         return sticker
 
-    async def update(self, sticker: DeskDetail) -> DeskDetail:
+    async def update_many(
+        self,
+        desk_id: UUID,
+        updates: dict[UUID, dict],
+        versions: dict[UUID, int] | None = None,
+    ) -> list[DeskDetail]:
+        """Update several stickers of a desk in one statement and commit.
+
+        `updates` maps sticker id to the changed columns. Stickers missing
+        from the desk, or whose version differs from the one in `versions`,
+        are left unchanged and are not returned.
+        """
+        result = await self.session.scalars(self._update_stmt(desk_id, updates, versions))
+        updated = list(result.all())
         await self.session.commit()
-        await self.session.refresh(sticker)
-        return sticker
+        return updated
 
-    async def delete(self, sticker: DeskDetail) -> None:
-        await self.session.delete(sticker)
+    async def delete(self, desk_id: UUID, sticker_id: UUID) -> bool:
+        """DELETE ... RETURNING id, False if the sticker is not on the desk."""
+        deleted = await self.session.scalar(
+            delete(DeskDetail)
+            .where(DeskDetail.id == sticker_id, DeskDetail.desk_id == desk_id)
+            .returning(DeskDetail.id)
+            .execution_options(synchronize_session=False)
+        )
         await self.session.commit()
+        return deleted is not None
+
+    @staticmethod
+    def _update_stmt(
+        desk_id: UUID,
+        updates: dict[UUID, dict],
+        versions: dict[UUID, int] | None = None,
+    ):
+        """UPDATE ... FROM (VALUES ...) RETURNING; unset columns keep their value."""
+        versions = versions or {}
+        rows = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("expected_version", Integer),
+            *(column(name, type_) for name, type_ in UPDATABLE_FIELDS.items()),
+            name="changes",
+        ).data([
+            (
+                sticker_id,
+                versions.get(sticker_id),
+                *(fields.get(name) for name in UPDATABLE_FIELDS),
+            )
+            for sticker_id, fields in updates.items()
+        ])
+        return (
+            update(DeskDetail)
+            .where(
+                DeskDetail.id == rows.c.id,
+                DeskDetail.desk_id == desk_id,
+                or_(
+                    rows.c.expected_version.is_(None),
+                    # VALUES columns holding only NULLs are typed as text
+                    DeskDetail.version == cast(rows.c.expected_version, Integer),
+                ),
+            )
+            .values(
+                updated_at=date.today(),
+                version=DeskDetail.version + 1,
+                **{
+                    name: func.coalesce(cast(rows.c[name], type_), getattr(DeskDetail, name))
+                    for name, type_ in UPDATABLE_FIELDS.items()
+                },
+            )
+            .returning(DeskDetail)
+            .execution_options(synchronize_session=False)
+        )
 
     async def delete_by_desk_id(self, desk_id: UUID) -> None:
         await self.session.execute(
             delete(DeskDetail).where(DeskDetail.desk_id == desk_id)
         )
-        await self.session.commit()
\ No newline at end of file
+        await self.session.commit()
+
+    async def apply_batch(
+        self,
+        desk_id: UUID,
+        creates: list[dict],
+        updates: dict[UUID, dict],
+        deletes: list[UUID],
+    ) -> tuple[list[DeskDetail], list[DeskDetail], list[UUID]]:
+        """Apply creates, updates and deletes in one transaction.
+
+        One multi-row statement per op type. `updates` maps sticker id to the
+        changed columns, missing columns keep their value. Raises
+        StickersNotFoundError and rolls back if any updated or deleted
+        sticker is not on the desk.
+        """
+        created: list[DeskDetail] = []
+        updated: list[DeskDetail] = []
+        deleted: list[UUID] = []
+
+        try:
+            if creates:
+                result = await self.session.scalars(
+                    insert(DeskDetail).values(creates).returning(DeskDetail)
+                )
+                created = list(result.all())
+
+            if updates:
+                result = await self.session.scalars(self._update_stmt(desk_id, updates))
+                updated = list(result.all())
+
+            if deletes:
+                result = await self.session.scalars(
+                    delete(DeskDetail)
+                    .where(DeskDetail.desk_id == desk_id, DeskDetail.id.in_(deletes))
+                    .returning(DeskDetail.id)
+                    .execution_options(synchronize_session=False)
+                )
+                deleted = list(result.all())
+
+            missing = (set(updates) - {s.id for s in updated}) | (set(deletes) - set(deleted))
+            if missing:
+                raise StickersNotFoundError(missing)
+
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        return created, updated, deleted
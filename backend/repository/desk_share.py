@@ -1,6 +1,8 @@
+from datetime import date
 from uuid import UUID
-from sqlalchemy import select, and_, delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import Row, select, and_, delete, exists, func, or_, true, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from model import User
 
@@ -13,22 +15,18 @@ class DeskShareRepository:
 
     async def has_access(self, user_id: UUID, desk_id: UUID) -> bool:
         """Check if user is owner or has share access."""
-        # Check if owner
-        desk_result = await self.session.execute(
-            select(Desk).where(
-                and_(Desk.id == desk_id, Desk.owner_id == user_id)
-            )
-        )
-        if desk_result.scalar_one_or_none():
-            return True
-
-        # Check if shared
-        share_result = await self.session.execute(
-            select(DeskShare).where(
-                and_(DeskShare.desk_id == desk_id, DeskShare.user_id == user_id)
+        # owner or shared, in one round trip
+        result = await self.session.execute(
+            select(
+                or_(
+                    exists().where(and_(Desk.id == desk_id, Desk.owner_id == user_id)),
+                    exists().where(
+                        and_(DeskShare.desk_id == desk_id, DeskShare.user_id == user_id)
+                    ),
+                )
             )
         )
-        return share_result.scalar_one_or_none() is not None
+        return bool(result.scalar())
 
     async def get_by_desk_id(self, desk_id: UUID) -> list[DeskShare]:
         result = await self.session.execute(
@@ -36,11 +34,54 @@ class DeskShareRepository:
         )
         return list(result.scalars().all())
 
-    async def get_shared_desks(self, user_id: UUID) -> list[DeskShare]:
+    async def get_shared_page(
+        self,
+        user_id: UUID,
+        limit: int,
+        after: tuple[date, UUID] | None = None,
+    ) -> tuple[list[Row], int]:
+        """Desks shared with a user with their owner and shared_at, newest share first.
+
+        One statement: the page (desk, owner name, share date) is LEFT JOINed
+        to the share count. The keyset is the share's (created_at, desk_id),
+        read in order from ix_desk_share_user_id_created_at_id, so a page
+        costs the same however deep it is; only its rows are joined.
+        """
+        conditions = [DeskShare.user_id == user_id]
+        if after is not None:
+            conditions.append(tuple_(DeskShare.created_at, DeskShare.desk_id) < after)
+
+        total = (
+            select(func.count().label("total"))
+            .where(DeskShare.user_id == user_id)
+            .subquery()
+        )
+        page = (
+            select(
+                Desk.id,
+                Desk.name,
+                Desk.owner_id,
+                User.name.label("owner_name"),
+                DeskShare.created_at.label("shared_at"),
+                Desk.created_at,
+                Desk.updated_at,
+            )
+            .select_from(DeskShare)
+            .join(Desk, Desk.id == DeskShare.desk_id)
+            .join(User, User.id == Desk.owner_id)
+            .where(*conditions)
+            .order_by(DeskShare.created_at.desc(), DeskShare.desk_id.desc())
+            .limit(limit)
+            .subquery()
+        )
         result = await self.session.execute(
-            select(DeskShare).where(DeskShare.user_id == user_id)
+            select(total.c.total, page)
+            .select_from(total)
+            .outerjoin(page, true())
+            .order_by(page.c.shared_at.desc(), page.c.id.desc())
         )
-        return list(result.scalars().all())
+        rows = result.all()
+        return [row for row in rows if row.id is not None], rows[0].total
 
     async def create(self, share: DeskShare) -> DeskShare:
         self.session.add(share)
@@ -73,35 +114,22 @@ class DeskShareRepository:
         return result.rowcount or 0
     
     async def add_user_to_desk_share(self, desk_id: UUID, user_id: UUID) -> DeskShare:
-        # проверить дубль
-        stmt = select(DeskShare).where(
-            DeskShare.desk_id == desk_id,
-            DeskShare.user_id == user_id,
+        # дубль отсекает uq_desk_share_desk_id_user_id
+        await self.session.execute(
+            insert(DeskShare)
+            .values(desk_id=desk_id, user_id=user_id)
+            .on_conflict_do_nothing(index_elements=[DeskShare.desk_id, DeskShare.user_id])
         )
-        res = await self.session.execute(stmt)
-        existing = res.scalars().first()
-        if existing:
-            # eager подгрузка
-            stmt2 = (
-                select(DeskShare)
-                .where(DeskShare.id == existing.id)
-                .options(selectinload(DeskShare.user))
-            )
-            res2 = await self.session.execute(stmt2)
-            return res2.scalars().one()
-
-        share = DeskShare(desk_id=desk_id, user_id=user_id)
-        self.session.add(share)
         await self.session.commit()
-        await self.session.refresh(share)
 
-        stmt3 = (
+        # новая или уже существующая запись вместе с пользователем
+        stmt = (
             select(DeskShare)
-            .where(DeskShare.id == share.id)
-            .options(selectinload(DeskShare.user))
+            .where(DeskShare.desk_id == desk_id, DeskShare.user_id == user_id)
+            .options(joinedload(DeskShare.user))
         )
-        res3 = await self.session.execute(stmt3)
-        return res3.scalars().one()
+        res = await self.session.execute(stmt)
+        return res.scalars().one()
     
     async def get_shares_with_users(self, desk_id: UUID) -> list[DeskShare]:
         stmt = (
@@ -1,7 +1,8 @@
 from uuid import UUID
-from datetime import date
+from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func
+from core.sessions import session_state
 from model.session import Session
 
 
@@ -28,14 +29,41 @@ class SessionRepository:
         stmt = (
             update(Session)
             .where(Session.id == session_id)
-            .values(is_active=False, last_active=date.today())
+            .values(is_active=False, last_active=date.today(), deactivated_at=func.now())
         )
         result = await self.session.execute(stmt)
         await self.session.commit()
+        session_state.mark_inactive(session_id)
         return result.rowcount > 0
 
-    async def delete_expired(self, before: date) -> int:
-        stmt = delete(Session).where(Session.last_active < before)
+    async def get_deactivated_since(self, since: datetime) -> list[tuple[UUID, datetime]]:
+        stmt = select(Session.id, Session.deactivated_at).where(Session.deactivated_at >= since)
+        result = await self.session.execute(stmt)
+        return [tuple(row) for row in result]
+
+    async def db_now(self) -> datetime:
+        return await self.session.scalar(select(func.now()))
+
+    async def delete_expired(self, before: date, limit: int | None = None) -> int:
+        return await self._delete_where(Session.last_active < before, limit=limit)
+
+    async def delete_inactive(self, before: datetime, limit: int | None = None) -> int:
+        return await self._delete_where(
+            Session.is_active == False, Session.deactivated_at < before, limit=limit
+        )
+
+    async def _delete_where(self, *conditions, limit: int | None = None) -> int:
+        if limit is None:
+            stmt = delete(Session).where(*conditions)
+        else:
+            # rows locked by another worker's batch are left to it
+            batch = (
+                select(Session.id)
+                .where(*conditions)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            stmt = delete(Session).where(Session.id.in_(batch.scalar_subquery()))
         result = await self.session.execute(stmt)
         await self.session.commit()
-        return result.rowcount
\ No newline at end of file
+        return result.rowcount
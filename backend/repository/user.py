@@ -1,6 +1,8 @@
 from uuid import UUID
-from sqlalchemy import select, func, delete
+from sqlalchemy import select, func, delete, literal, or_, union_all
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from core.usercache import invalidate_user
 from model.user import User
 
 
@@ -18,9 +20,21 @@ class UserRepository:
         await self.session.refresh(user)
         return user
 
+    async def create_if_absent(self, name: str, email: str, pass_hash: str) -> User | None:
+        """INSERT ... ON CONFLICT (email) DO NOTHING; None if the email is taken."""
+        user = await self.session.scalar(
+            insert(User)
+            .values(name=name, email=email, pass_hash=pass_hash)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User)
+        )
+        await self.session.commit()
+        return user
+
     async def update(self, user: User) -> User:
         self.session.add(user)
         await self.session.commit()
+        invalidate_user(user.id)
         return user
 
     async def get_all(self, limit: int = 100) -> list[User]:
@@ -34,17 +48,51 @@ class UserRepository:
     async def delete(self, id: UUID) -> None:
         await self.session.execute(delete(User).where(User.id == id))
         await self.session.commit()
+        invalidate_user(id)
 
     async def get_by_email(self, email: str) -> User | None:
         result = await self.session.execute(select(User).where(User.email == email))
         return result.scalar_one_or_none()
 
-    async def search_by_email(self, query: str, limit: int = 20) -> list[User]:
-        """Search users by partial email match (case-insensitive)."""
-        pattern = f"%{query}%"
+    async def search(self, query: str, limit: int = 20) -> list[User]:
+        """Users whose email or name contains `query`, case-insensitive.
+
+        Email prefix matches come first, then name prefix matches, then the
+        remaining substring matches. Prefix tiers are read in index order
+        (lower(...) text_pattern_ops), substring matches via the trigram
+        indexes, so no tier scans the whole table.
+        """
+        q = _escape_like(query.lower())
+        prefix, infix = f"{q}%", f"%{q}%"
+        email, name = func.lower(User.email), func.lower(User.name)
+        email_prefix, name_prefix = email.like(prefix), name.like(prefix)
+
+        tiers = union_all(
+            select(User.id, literal(0).label("tier"), email.label("key"))
+            .where(email_prefix)
+            .order_by(email)
+            .limit(limit),
+            select(User.id, literal(1), name)
+            .where(name_prefix, ~email_prefix)
+            .order_by(name)
+            .limit(limit),
+            select(User.id, literal(2), email)
+            .where(
+                or_(User.email.ilike(infix), User.name.ilike(infix)),
+                ~email_prefix,
+                ~name_prefix,
+            )
+            .limit(limit),
+        ).subquery()
+
         result = await self.session.execute(
             select(User)
-            .where(User.email.ilike(pattern))
+            .join(tiers, User.id == tiers.c.id)
+            .order_by(tiers.c.tier, tiers.c.key)
             .limit(limit)
         )
-        return list(result.scalars().all())
\ No newline at end of file
+        return list(result.scalars().all())
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
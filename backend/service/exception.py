@@ -11,4 +11,17 @@ class InvalidRefreshTokenError(Exception):
     pass
 
 class InvalidAccessTokenError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class StickersNotFoundError(Exception):
+    def __init__(self, sticker_ids):
+        super().__init__(sticker_ids)
+        self.sticker_ids = sticker_ids
+
+class PasswordHasherBusyError(Exception):
+    pass
+
+class StickerVersionConflictError(Exception):
+    def __init__(self, sticker):
+        super().__init__(sticker)
+        self.sticker = sticker
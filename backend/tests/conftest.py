@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+# run from backend/, like the app: settings read ../.env relative to it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeWebSocket:
+    """Accepted socket that records sent frames and idles until disconnect()."""
+
+    def __init__(self) -> None:
+        self.scope = {"subprotocols": []}
+        self.sent: list[str] = []
+        self.close_code: int | None = None
+        self.got_init = asyncio.Event()
+        self._inbox: asyncio.Queue = asyncio.Queue()
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(text)
+        if '"desk:init"' in text:
+            self.got_init.set()
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.sent.append(data)
+
+    async def receive_json(self) -> dict:
+        message = await self._inbox.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.close_code = code
+        self.got_init.set()
+
+    def disconnect(self) -> None:
+        self._inbox.put_nowait(None)
+
+
+class CountingPool:
+    """Stand-in for async_session_factory that fails once `size` sessions are out."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.checked_out = 0
+        self.peak = 0
+
+    @asynccontextmanager
+    async def __call__(self):
+        if self.checked_out >= self.size:
+            raise RuntimeError("connection pool exhausted")
+        self.checked_out += 1
+        self.peak = max(self.peak, self.checked_out)
+        try:
+            # let other sockets run while the session is out
+            await asyncio.sleep(0)
+            yield object()
+        finally:
+            self.checked_out -= 1
+
+
+@pytest.fixture
+def fake_websocket():
+    return FakeWebSocket
+
+
+@pytest.fixture
+def counting_pool():
+    return CountingPool
@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import core.deskstate as deskstate
+from core.deskstate import DeskState, DeskStateEngine
+
+
+class FlakyDatabase:
+    """Stand-in for async_session_factory whose sessions fail while `down` is set."""
+
+    def __init__(self) -> None:
+        self.down = True
+        self.statements = 0
+
+    @asynccontextmanager
+    async def __call__(self):
+        if self.down:
+            raise ConnectionError("database is down")
+        yield self
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+
+    async def execute(self, statement) -> None:
+        self.statements += 1
+
+
+def test_desk_whose_last_flush_failed_is_retried_then_unloaded(monkeypatch):
+    database = FlakyDatabase()
+    monkeypatch.setattr(deskstate, "async_session_factory", database)
+
+    async def run() -> None:
+        engine = DeskStateEngine(enabled=True)
+        desk_uuid = uuid.uuid4()
+        state = DeskState(desk_uuid, {})
+        engine._desks[desk_uuid] = state
+        state.refs = 1
+        engine.create(desk_uuid, {
+            "id": str(uuid.uuid4()),
+            "coord": {"x": 0, "y": 0},
+            "size": {"width": 100, "height": 100},
+            "color": "#fff",
+            "text": "",
+            "version": 1,
+        })
+
+        # the last client leaves while the database is down: nothing is lost
+        await engine.release(desk_uuid)
+        assert engine.get(desk_uuid) is state
+        assert state.dirty
+        assert engine.stats()["idle_dirty_desks"] == 1
+
+        # the next flush writes the changes and unloads the desk
+        database.down = False
+        await engine.flush_all()
+        assert database.statements == 1
+        assert engine.get(desk_uuid) is None
+        assert engine.stats()["idle_dirty_desks"] == 0
+
+    asyncio.run(run())
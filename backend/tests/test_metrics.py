@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from api.dependencies import require_metrics_token
+from core.config import settings
+from core.connmanager import manager, queue_depth_stats
+
+
+def check(token: str | None) -> int:
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) if token else None
+    try:
+        asyncio.run(require_metrics_token(credentials))
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_metrics_need_the_configured_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert check("anything") == 404
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scraper-secret")
+    assert check(None) == 401
+    assert check("wrong") == 401
+    assert check("scraper-secret") == 200
+
+
+@pytest.mark.parametrize("depths, expected", [
+    ([], {"count": 0, "max": 0, "p99": 0}),
+    ([3], {"count": 1, "max": 3, "p99": 3}),
+    ([0] * 99 + [250], {"count": 100, "max": 250, "p99": 250}),
+    ([0] * 199 + [250], {"count": 200, "max": 250, "p99": 0}),
+])
+def test_queue_depth_is_aggregated(depths, expected):
+    assert queue_depth_stats(depths) == expected
+
+
+def test_ws_stats_have_no_desk_ids():
+    assert set(manager.stats()["queue_depth"]) == {"count", "max", "p99"}
@@ -0,0 +1,15 @@
+from core.oplog import DeskOpLog
+
+
+def test_byte_cap_counts_encoded_frame_bytes():
+    log = DeskOpLog(size=1000, max_bytes=2000)
+    frames = [
+        log.append({"event": "sticker:updated", "data": {"text": "заметка " * 20}})
+        for _ in range(10)
+    ]
+    # Cyrillic text takes two bytes per letter on the wire
+    kept = 2000 // len(frames[0].text.encode())
+    assert log.bytes == sum(len(frame.text.encode()) for frame in frames[-kept:])
+    # the newest frames stay, the oldest are dropped first
+    assert log.since(log.version - kept) == frames[-kept:]
+    assert log.since(log.version - kept - 1) is None
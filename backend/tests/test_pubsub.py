@@ -0,0 +1,59 @@
+import asyncio
+
+from core.encoding import Frame
+from core.pubsub import NOTIFY_PAYLOAD_LIMIT, PostgresBackend, split_payload
+
+DESK_ID = "2f1b6c7e-3a0e-4a61-9e0a-7d1f6a3f1c11"
+
+
+class FakeListener:
+    """Raw asyncpg connection that hands each NOTIFY to other workers' backends."""
+
+    def __init__(self, workers: list[PostgresBackend]) -> None:
+        self.workers = workers
+        self.notifies: list[str] = []
+
+    async def execute(self, sql: str, channel: str, payload) -> None:
+        for notify in payload if isinstance(payload, list) else [payload]:
+            assert len(notify.encode()) <= NOTIFY_PAYLOAD_LIMIT
+            self.notifies.append(notify)
+            for worker in self.workers:
+                worker._on_notify(None, 0, channel, notify)
+
+
+def test_split_payload_keeps_characters_whole():
+    payload = "стикер " * 1000
+    pieces = split_payload(payload, 100)
+    assert "".join(pieces) == payload
+    assert all(len(piece.encode()) <= 100 for piece in pieces)
+
+
+def test_large_message_reaches_other_workers():
+    async def run() -> None:
+        received = []
+
+        async def handler(desk_id, message) -> None:
+            received.append((desk_id, message))
+
+        sender, other = PostgresBackend(), PostgresBackend()
+        other.set_handler(handler)
+        listener = sender._raw = FakeListener([sender, other])
+
+        # a batch:applied of a few dozen stickers is well above the NOTIFY limit
+        message = {
+            "event": "batch:applied",
+            "desk_id": DESK_ID,
+            "data": {"created": [{"sticker": {"text": "заметка " * 40}} for _ in range(60)]},
+        }
+        await sender.publish(DESK_ID, Frame(message))
+        await sender.publish(DESK_ID, Frame({"event": "sticker:deleted", "desk_id": DESK_ID}))
+        await asyncio.sleep(0)
+
+        assert len(listener.notifies) > 2
+        assert received == [
+            (DESK_ID, message),
+            (DESK_ID, {"event": "sticker:deleted", "desk_id": DESK_ID}),
+        ]
+        assert not other._partials
+
+    asyncio.run(run())
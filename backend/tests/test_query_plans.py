@@ -0,0 +1,183 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from core.database import engine
+from repository.desk import DeskRepository
+from repository.desk_detail import DeskDetailRepository
+from repository.desk_share import DeskShareRepository
+from repository.session import SessionRepository
+from repository.user import UserRepository
+
+# the migrated dev database from docker-compose; skipped when it isn't reachable.
+# Seeded rows live in one transaction that is rolled back at the end.
+
+USERS = 20_000
+DESKS = 40_000
+STICKERS = 200_000
+SHARES = 60_000
+SESSIONS = 60_000
+
+SEED = [
+    f"""
+    INSERT INTO "user" (id, created_at, name, email, pass_hash)
+    SELECT gen_random_uuid(), current_date - n % 1000, 'Seed User ' || n,
+           'seed.user' || n || '@example.org', 'x'
+    FROM generate_series(1, {USERS}) AS n
+    """,
+    f"""
+    INSERT INTO desks (id, name, owner_id, created_at, updated_at)
+    SELECT gen_random_uuid(), 'Seed desk ' || n, u.ids[1 + n % {USERS}],
+           current_date - n % 365, current_date - n % 30
+    FROM (SELECT array_agg(id) AS ids FROM "user" WHERE email LIKE 'seed.user%') AS u,
+         generate_series(1, {DESKS}) AS n
+    """,
+    f"""
+    INSERT INTO desk_detail (id, created_at, updated_at, desk_id, x, y, width, height, color, text)
+    SELECT gen_random_uuid(), current_date, current_date, d.ids[1 + n % {DESKS}],
+           n % 4000, n % 3000, 200, 150, '#ffeb3b', 'Seed sticker ' || n
+    FROM (SELECT array_agg(id) AS ids FROM desks WHERE name LIKE 'Seed desk %') AS d,
+         generate_series(1, {STICKERS}) AS n
+    """,
+    f"""
+    INSERT INTO desk_share (id, desk_id, user_id, created_at)
+    SELECT gen_random_uuid(), d.ids[1 + n % {DESKS}], u.ids[1 + (n * 7) % {USERS}],
+           current_date - n % 365
+    FROM (SELECT array_agg(id) AS ids FROM desks WHERE name LIKE 'Seed desk %') AS d,
+         (SELECT array_agg(id) AS ids FROM "user" WHERE email LIKE 'seed.user%') AS u,
+         generate_series(1, {SHARES}) AS n
+    ON CONFLICT (desk_id, user_id) DO NOTHING
+    """,
+    f"""
+    INSERT INTO session (id, created_at, last_active, is_active, user_id)
+    SELECT gen_random_uuid(), current_date - n % 60, current_date - n % 60, n % 3 <> 0,
+           u.ids[1 + n % {USERS}]
+    FROM (SELECT array_agg(id) AS ids FROM "user" WHERE email LIKE 'seed.user%') AS u,
+         generate_series(1, {SESSIONS}) AS n
+    """,
+    # the planner needs statistics of the seeded rows
+    'ANALYZE "user", desks, desk_detail, desk_share, session',
+]
+
+
+async def plan_calls(conn: AsyncConnection) -> dict[str, list[str]]:
+    """Run the hot repository calls on the seeded data, EXPLAIN what they executed."""
+    executed: list[tuple[str, tuple]] = []
+
+    @event.listens_for(conn.sync_connection, "before_cursor_execute")
+    def record(_conn, _cursor, statement, parameters, _context, _executemany):
+        executed.append((statement, parameters))
+
+    share = (await conn.execute(text(
+        "SELECT desk_id, user_id, created_at FROM desk_share WHERE user_id = "
+        "(SELECT id FROM \"user\" WHERE email = 'seed.user1234@example.org') LIMIT 1"
+    ))).one()
+
+    calls = {
+        "login": lambda s: UserRepository(s).get_by_email("seed.user1234@example.org"),
+        "search_prefix": lambda s: UserRepository(s).search("seed.user1234", 10),
+        "search_substring": lambda s: UserRepository(s).search("gmail", 10),
+        "desk_detail_by_desk": lambda s: DeskDetailRepository(s).get_by_desk_id(share.desk_id),
+        "desk_detail_page": lambda s: DeskDetailRepository(s).get_page_by_desk_id(
+            share.desk_id, 500, share.desk_id
+        ),
+        "has_access": lambda s: DeskShareRepository(s).has_access(share.user_id, share.desk_id),
+        "add_share": lambda s: DeskShareRepository(s).add_user_to_desk_share(
+            share.desk_id, share.user_id
+        ),
+        "desks_by_owner": lambda s: DeskRepository(s).get_owned_by_user(share.user_id),
+        "desks_page": lambda s: DeskRepository(s).get_owned_page(
+            share.user_id, 6, (date.today() - timedelta(days=15), share.desk_id)
+        ),
+        "shared_page": lambda s: DeskShareRepository(s).get_shared_page(
+            share.user_id, 6, (share.created_at, share.desk_id)
+        ),
+        "sessions_by_user": lambda s: SessionRepository(s).get_active_by_user(share.user_id),
+    }
+
+    plans: dict[str, list[str]] = {}
+    for name, call in calls.items():
+        # commits inside the call only release a savepoint of the seed transaction
+        async with AsyncSession(
+            bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False
+        ) as session:
+            executed.clear()
+            await call(session)
+            statements = [
+                (statement, parameters)
+                for statement, parameters in executed
+                if not statement.startswith(("SAVEPOINT", "RELEASE", "ROLLBACK"))
+            ]
+        plans[name] = []
+        for statement, parameters in statements:
+            # same statement and parameters as the call, so the same plan
+            rows = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+            plans[name].append("\n".join(row[0] for row in rows))
+    return plans
+
+
+@pytest.fixture(scope="module")
+def plans() -> dict[str, list[str]]:
+    async def ping() -> None:
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(asyncio.wait_for(ping(), timeout=5))
+    except Exception as e:
+        pytest.skip(f"no database: {e}")
+
+    async def run() -> dict[str, list[str]]:
+        try:
+            async with engine.connect() as conn:
+                transaction = await conn.begin()
+                try:
+                    for statement in SEED:
+                        await conn.execute(text(statement))
+                    return await plan_calls(conn)
+                finally:
+                    await transaction.rollback()
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("call", [
+    "login",
+    "search_prefix",
+    "search_substring",
+    "desk_detail_by_desk",
+    "desk_detail_page",
+    "has_access",
+    "add_share",
+    "desks_by_owner",
+    "desks_page",
+    "shared_page",
+    "sessions_by_user",
+])
+def test_hot_query_uses_indexes(plans, call):
+    assert plans[call], f"{call} ran no statement"
+    for plan in plans[call]:
+        assert "Seq Scan" not in plan, plan
+
+
+@pytest.mark.parametrize("call, index", [
+    ("login", "uq_user_email"),
+    ("desk_detail_by_desk", "ix_desk_detail_desk_id_id"),
+    ("desk_detail_page", "ix_desk_detail_desk_id_id"),
+    ("has_access", "uq_desk_share_desk_id_user_id"),
+    ("add_share", "uq_desk_share_desk_id_user_id"),
+    ("desks_by_owner", "ix_desks_owner_id_updated_at_id"),
+    ("desks_page", "ix_desks_owner_id_updated_at_id"),
+    ("shared_page", "ix_desk_share_user_id_created_at_id"),
+    ("sessions_by_user", "ix_session_user_id"),
+])
+def test_hot_query_uses_its_index(plans, call, index):
+    assert any(index in plan for plan in plans[call]), plans[call]
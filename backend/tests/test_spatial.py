@@ -0,0 +1,47 @@
+import asyncio
+
+from core.spatial import SpatialView, scope_message
+
+VIEWPORT = (0, 0, 1000, 1000)
+
+
+def sticker(sticker_id: str, x: float) -> dict:
+    return {
+        "id": sticker_id,
+        "coord": {"x": x, "y": 0},
+        "size": {"width": 100, "height": 100},
+        "version": 1,
+    }
+
+
+def test_creator_gets_its_create_outside_the_viewport():
+    async def run() -> None:
+        view = SpatialView(512)
+        view.load([])
+        created = {
+            "event": "sticker:created",
+            "data": {"temp_id": "t1", "sticker": sticker("s1", 5000)},
+        }
+        view.apply(created)
+
+        # others don't see it, the creator gets the ack for its temp_id
+        others, creator = set(), set()
+        assert scope_message(created, view, VIEWPORT, others) == []
+        assert scope_message(created, view, VIEWPORT, creator, origin=True) is None
+        assert creator == {"s1"}
+
+        batch = {
+            "event": "batch:applied",
+            "data": {
+                "batch_id": "b1",
+                "created": [{"temp_id": "t2", "sticker": sticker("s2", 5000)}],
+                "updated": [],
+                "deleted": [],
+            },
+        }
+        view.apply(batch)
+        assert scope_message(batch, view, VIEWPORT, set(), origin=True) is None
+        scoped = scope_message(batch, view, VIEWPORT, set())
+        assert scoped[0]["data"]["created"] == []
+
+    asyncio.run(run())
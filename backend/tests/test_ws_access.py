@@ -0,0 +1,40 @@
+import asyncio
+import uuid
+
+import api.ws as ws_api
+import core.access as access
+from core.connmanager import CLOSE_ACCESS_REVOKED
+from core.security import create_access_token
+from tests.test_ws_pool import FakeDeskDetailRepository, FakeShareRepository, open_desk
+
+
+def test_revoke_closes_any_spelling_of_the_desk_id(monkeypatch, fake_websocket, counting_pool):
+    pool = counting_pool(10)
+    monkeypatch.setattr(access, "async_session_factory", pool)
+    monkeypatch.setattr(access, "DeskShareRepository", FakeShareRepository)
+    monkeypatch.setattr(ws_api, "async_session_factory", pool)
+    monkeypatch.setattr(ws_api, "DeskDetailRepository", FakeDeskDetailRepository)
+    access.access_cache.clear()
+
+    async def run() -> None:
+        user_id = uuid.uuid4()
+        token = create_access_token(user_id, uuid.uuid4())
+        desk_id = uuid.uuid4()
+
+        sockets = [fake_websocket() for _ in range(3)]
+        tasks = [
+            open_desk(ws, spelling, token)
+            for ws, spelling in zip(sockets, [str(desk_id), str(desk_id).upper(), desk_id.hex])
+        ]
+        await asyncio.wait_for(
+            asyncio.gather(*(ws.got_init.wait() for ws in sockets)), timeout=5
+        )
+
+        await access.revoke_access(desk_id, user_id)
+        assert [ws.close_code for ws in sockets] == [CLOSE_ACCESS_REVOKED] * 3
+
+        for ws in sockets:
+            ws.disconnect()
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+
+    asyncio.run(run())
@@ -0,0 +1,128 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import orjson
+
+import api.ws as ws_api
+import core.access as access
+from core.security import create_access_token
+
+IDLE_SOCKETS = 500
+POOL_SIZE = 10
+
+
+class FakeShareRepository:
+    def __init__(self, session) -> None:
+        pass
+
+    async def has_access(self, user_id, desk_id) -> bool:
+        return True
+
+
+class FakeDeskDetailRepository:
+    def __init__(self, session) -> None:
+        pass
+
+    async def get_by_desk_id(self, desk_id) -> list:
+        return []
+
+
+def open_desk(ws, desk_id: uuid.UUID, token: str) -> asyncio.Task:
+    return asyncio.create_task(ws_api.desk_ws(
+        ws, str(desk_id), token, since=None, epoch=None, viewport=None, init=None,
+    ))
+
+
+def test_idle_sockets_hold_no_sessions(monkeypatch, fake_websocket, counting_pool):
+    pool = counting_pool(POOL_SIZE)
+    monkeypatch.setattr(access, "async_session_factory", pool)
+    monkeypatch.setattr(access, "DeskShareRepository", FakeShareRepository)
+    monkeypatch.setattr(ws_api, "async_session_factory", pool)
+    monkeypatch.setattr(ws_api, "DeskDetailRepository", FakeDeskDetailRepository)
+    access.access_cache.clear()
+
+    async def run() -> None:
+        token = create_access_token(uuid.uuid4(), uuid.uuid4())
+        desk_id = uuid.uuid4()
+
+        sockets = [fake_websocket() for _ in range(IDLE_SOCKETS)]
+        tasks = [open_desk(ws, desk_id, token) for ws in sockets]
+        await asyncio.wait_for(
+            asyncio.gather(*(ws.got_init.wait() for ws in sockets)), timeout=30
+        )
+
+        # every socket got its desk:init and now just waits for events
+        assert all(ws.close_code is None for ws in sockets)
+        assert pool.checked_out == 0
+        assert pool.peak <= POOL_SIZE
+
+        # with all of them open a new desk can still be opened
+        late = fake_websocket()
+        late_task = open_desk(late, uuid.uuid4(), token)
+        await asyncio.wait_for(late.got_init.wait(), timeout=5)
+        assert late.close_code is None
+        assert pool.checked_out == 0
+
+        for ws in [*sockets, late]:
+            ws.disconnect()
+        await asyncio.wait_for(asyncio.gather(*tasks, late_task), timeout=30)
+
+    asyncio.run(run())
+
+
+class PagedDeskDetailRepository:
+    """Desk of `STREAMED` stickers served one keyset page at a time."""
+
+    def __init__(self, session) -> None:
+        pass
+
+    async def get_page_by_desk_id(self, desk_id, limit, after=None) -> list:
+        ids = [uuid.UUID(int=i) for i in range(1, STREAMED + 1)]
+        start = 0 if after is None else ids.index(after) + 1
+        return [
+            SimpleNamespace(
+                id=sticker_id, desk_id=desk_id, x=0, y=0, width=100, height=100,
+                color="#fff", text="", version=1,
+            )
+            for sticker_id in ids[start:start + limit]
+        ]
+
+
+STREAMED = 1200
+
+
+def test_streamed_init_holds_no_session_while_the_client_lags(
+        monkeypatch, fake_websocket, counting_pool,
+):
+    pool = counting_pool(1)
+    monkeypatch.setattr(ws_api, "async_session_factory", pool)
+    monkeypatch.setattr(ws_api, "DeskDetailRepository", PagedDeskDetailRepository)
+    monkeypatch.setattr(ws_api.settings, "DESK_INIT_CHUNK_SIZE", 500)
+
+    async def run() -> None:
+        ws = fake_websocket()
+        sessions_out_while_sending: list[int] = []
+        send_text = ws.send_text
+
+        async def slow_send_text(text: str) -> None:
+            sessions_out_while_sending.append(pool.checked_out)
+            await asyncio.sleep(0.01)
+            await send_text(text)
+
+        ws.send_text = slow_send_text
+        client = ws_api.manager.open(ws)
+        conn = await ws_api.manager.subscribe(client, str(uuid.uuid4()))
+        await ws_api.stream_init(conn, conn.desk_id, uuid.UUID(conn.desk_id))
+        while not ws.sent or '"desk:init:done"' not in ws.sent[-1]:
+            await asyncio.sleep(0.01)
+        await client.close()
+
+        events = [orjson.loads(text) for text in ws.sent]
+        chunks = [e for e in events if e["event"] == "desk:init:chunk"]
+        assert [len(c["data"]["stickers"]) for c in chunks] == [500, 500, 200]
+        assert events[-1]["event"] == "desk:init:done"
+        assert events[-1]["data"]["count"] == STREAMED
+        assert set(sessions_out_while_sending) == {0}
+
+    asyncio.run(run())
@@ -1,31 +1,31 @@
 -- Seed: Stickers (desk_detail)
-INSERT INTO desk_detail (id, created_at, updated_at, desk_id, coord, size, color, text) VALUES
+INSERT INTO desk_detail (id, created_at, updated_at, desk_id, x, y, width, height, color, text) VALUES
     -- Стикеры на доске "Спринт #14"
     ('d1a2b3c4-5678-4def-8901-234567890abc', '2025-01-10', '2025-01-15', 'ef0d866e-8fea-4363-8428-10316fe7857e',
-     '{"x": 100, "y": 100}', '{"width": 200, "height": 150}', '#FFEB3B', 'Сделать авторизацию'),
+     100, 100, 200, 150, '#FFEB3B', 'Сделать авторизацию'),
     ('d2b3c4d5-6789-4ef0-9012-345678901bcd', '2025-01-10', '2025-01-15', 'ef0d866e-8fea-4363-8428-10316fe7857e',
-     '{"x": 350, "y": 100}', '{"width": 200, "height": 150}', '#4CAF50', 'WebSocket подключение'),
+     350, 100, 200, 150, '#4CAF50', 'WebSocket подключение'),
     ('d3c4d5e6-7890-4f01-0123-456789012cde', '2025-01-11', '2025-01-15', 'ef0d866e-8fea-4363-8428-10316fe7857e',
-     '{"x": 100, "y": 300}', '{"width": 200, "height": 150}', '#F44336', 'Фикс бага с токеном'),
+     100, 300, 200, 150, '#F44336', 'Фикс бага с токеном'),
     ('d4d5e6f7-8901-4012-1234-567890123def', '2025-01-12', '2025-01-15', 'ef0d866e-8fea-4363-8428-10316fe7857e',
-     '{"x": 350, "y": 300}', '{"width": 200, "height": 150}', '#2196F3', 'Code review'),
+     350, 300, 200, 150, '#2196F3', 'Code review'),
 
     -- Стикеры на доске "Ретроспектива Q1"
     ('e1f2a3b4-9012-4123-2345-678901234ef0', '2025-01-12', '2025-01-14', 'd35d14da-e712-4cbe-8398-75c21db211e1',
-     '{"x": 50, "y": 50}', '{"width": 180, "height": 120}', '#4CAF50', 'Хорошо: быстрый деплой'),
+     50, 50, 180, 120, '#4CAF50', 'Хорошо: быстрый деплой'),
     ('e2a3b4c5-0123-4234-3456-789012345f01', '2025-01-12', '2025-01-14', 'd35d14da-e712-4cbe-8398-75c21db211e1',
-     '{"x": 280, "y": 50}', '{"width": 180, "height": 120}', '#4CAF50', 'Хорошо: командная работа'),
+     280, 50, 180, 120, '#4CAF50', 'Хорошо: командная работа'),
     ('e3b4c5d6-1234-4345-4567-890123456012', '2025-01-12', '2025-01-14', 'd35d14da-e712-4cbe-8398-75c21db211e1',
-     '{"x": 50, "y": 220}', '{"width": 180, "height": 120}', '#F44336', 'Плохо: мало тестов'),
+     50, 220, 180, 120, '#F44336', 'Плохо: мало тестов'),
     ('e4c5d6e7-2345-4456-5678-901234567123', '2025-01-12', '2025-01-14', 'd35d14da-e712-4cbe-8398-75c21db211e1',
-     '{"x": 280, "y": 220}', '{"width": 180, "height": 120}', '#FFEB3B', 'Идея: автотесты в CI'),
+     280, 220, 180, 120, '#FFEB3B', 'Идея: автотесты в CI'),
 
     -- Стикеры на доске "Дизайн главной страницы"
     ('f1d2e3f4-3456-4567-6789-012345678234', '2025-01-11', '2025-01-15', 'dcb2963c-633c-4bc7-a984-34cb0cae76e3',
-     '{"x": 80, "y": 80}', '{"width": 250, "height": 180}', '#9C27B0', 'Hero секция с анимацией'),
+     80, 80, 250, 180, '#9C27B0', 'Hero секция с анимацией'),
     ('f2e3f4a5-4567-4678-7890-123456789345', '2025-01-11', '2025-01-15', 'dcb2963c-633c-4bc7-a984-34cb0cae76e3',
-     '{"x": 380, "y": 80}', '{"width": 250, "height": 180}', '#00BCD4', 'Карточки фич'),
+     380, 80, 250, 180, '#00BCD4', 'Карточки фич'),
     ('f3f4a5b6-5678-4789-8901-234567890456', '2025-01-13', '2025-01-15', 'dcb2963c-633c-4bc7-a984-34cb0cae76e3',
-     '{"x": 80, "y": 310}', '{"width": 250, "height": 180}', '#FF9800', 'Футер с соцсетями')
+     80, 310, 250, 180, '#FF9800', 'Футер с соцсетями')
 ON CONFLICT (id) DO NOTHING;
 